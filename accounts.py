@@ -0,0 +1,104 @@
+import threading
+
+from cards import card_cooldown, card_reject_cooldown
+
+
+class CancelToken(threading.Event):
+    # The stop event every wait in the engine blocks on. Callbacks given to
+    # on_cancel run once, on the thread that calls set(); that is how
+    # requests already on the wire get aborted.
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.callbacks = []
+
+    def on_cancel(self, callback):
+        with self.lock:
+            if not self.is_set():
+                self.callbacks.append(callback)
+                return
+        callback()
+
+    def set(self):
+        with self.lock:
+            super().set()
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+
+class Reporter:
+    # What the engine needs from whoever runs it: where progress goes and
+    # whether to keep going. The Kivy app forwards everything to its UI bus;
+    # the CLI prints to stdout. The base class drops everything.
+    def __init__(self, account=0, stop_event=None):
+        self.account = account
+        self.stop_event = stop_event or CancelToken()
+        self.retries = 0
+
+    @property
+    def is_running(self):
+        return not self.stop_event.is_set()
+
+    def update_result(self, text):
+        pass
+
+    def update_progress(self, value):
+        pass
+
+    def update_counters(self, **counters):
+        pass
+
+    def update_status(self, text):
+        pass
+
+    def update_enemies(self, enemies):
+        # The Opponent tuples of a new round, once per round.
+        pass
+
+    def update_enemy(self, enemy_id, battles, result):
+        # After each battle: this session's battle count against the enemy
+        # and 'won', 'lost' or 'failed'.
+        pass
+
+    def record_retries(self, endpoint, retries):
+        if retries:
+            self.retries += retries
+            self.update_counters(retries=self.retries)
+
+
+default_config = {
+    'restore_key': '',
+    'power': 0,
+    'min_level': 8,
+    'min_level_storage': 8,
+    'attacks_per_player': 1,
+    'rest_after_attacks': 10,
+    'rest_duration': 60,
+    'attack_speed': 1.0,
+    'request_speed': 1.0,
+    'card_cooldown': card_cooldown,
+    'card_reject_cooldown': card_reject_cooldown,
+    'save_to_db': False,
+    'resume': False,
+}
+
+def account_config(values):
+    # Missing or empty values fall back to the defaults; the rest are coerced
+    # to the default's type, so form text and JSON numbers both work.
+    config = {}
+    for key, default in default_config.items():
+        value = values.get(key)
+        if value is None or value == '':
+            config[key] = default
+        elif isinstance(default, bool):
+            config[key] = value if isinstance(value, bool) else str(value).lower() in ('yes', 'true', '1')
+        else:
+            try:
+                config[key] = type(default)(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'{key}: {value!r} is not a valid {type(default).__name__}') from None
+    return config
@@ -0,0 +1,67 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from random import randint, seed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from decoding import PlayerRecord
+from storage import DBWriter, create_or_open_db, upsert_player_sql
+
+
+def make_players(count, offset=0):
+    return [PlayerRecord(str(100000 + offset + i), randint(10, 5000), randint(1, 60), 7)
+            for i in range(count)]
+
+
+def bench_row_by_row(db_path, batches):
+    # What update_players_in_db used to do: default pragmas, one execute per
+    # player and one commit per batch.
+    create_or_open_db(db_path)[0].execute('PRAGMA journal_mode=DELETE').close()
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    rows = 0
+    for players in batches:
+        for p in players:
+            cursor.execute(upsert_player_sql, (*p, time.time()))
+            rows += 1
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return rows, elapsed, 0.0
+
+
+def bench_writer(db_path, batches):
+    writer = DBWriter(db_path).start()
+    start = time.perf_counter()
+    for players in batches:
+        writer.upsert_players(players, 0)
+    submitted = time.perf_counter() - start
+    writer.flush()
+    elapsed = time.perf_counter() - start
+    writer.close()
+    return writer.rows_written, elapsed, submitted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the SQLite write path')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--batch', type=int, default=50, help='players per getopponents-sized batch')
+    args = parser.parse_args()
+
+    seed(1)
+    batches = [make_players(args.batch, offset) for offset in range(0, args.rows, args.batch)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, bench in (('row-by-row', bench_row_by_row), ('DBWriter', bench_writer)):
+            rows, elapsed, submitted = bench(os.path.join(tmp, f'{name}.db'), batches)
+            print(f'{name:>10}: {rows} rows in {elapsed:.2f}s = {rows / elapsed:,.0f} rows/s'
+                  + (f' (caller blocked {submitted * 1000:.1f}ms total)' if submitted else ''))
+
+
+if __name__ == '__main__':
+    main()
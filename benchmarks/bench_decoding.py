@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from random import Random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from requests.models import Response
+
+import decoding
+from decoding import decode_json, project_load, project_players
+
+
+def opponents_payload(rng, count=40):
+    return {'status': True, 'data': {'players': [{
+        'id': rng.randint(10 ** 6, 10 ** 8),
+        'name': f'player_{rng.randint(0, 10 ** 6)}',
+        'rank': rng.randint(1, 50000),
+        'xp': rng.randint(0, 10 ** 6),
+        'gold': rng.randint(0, 10 ** 7),
+        'tribe_id': rng.randint(1, 5000),
+        'tribe_name': 'قبیله ' + str(rng.randint(1, 5000)),
+        'tribe_permission': rng.randint(0, 3),
+        'level': rng.randint(1, 80),
+        'def_power': rng.randint(10, 90000),
+        'status': rng.randint(0, 2),
+        'league_id': 7,
+        'league_rank': rng.randint(1, 200),
+        'avatar_id': rng.randint(1, 60),
+        'online_at': rng.randint(1.6e9, 1.7e9),
+        'mood_id': rng.randint(0, 5),
+    } for _ in range(count)]}}
+
+
+def load_payload(rng, cards=600):
+    return {'status': True, 'data': {
+        'id': rng.randint(10 ** 6, 10 ** 8),
+        'name': 'me',
+        'level': 42,
+        'gold': 123456,
+        'xp': 999999,
+        'q': rng.randint(10 ** 8, 10 ** 9),
+        'league_id': 7,
+        'tribe': {'id': 12, 'name': 'قبیله', 'description': 'x' * 400, 'members': [
+            {'id': i, 'name': f'm{i}', 'level': rng.randint(1, 80), 'xp': rng.randint(0, 10 ** 6)} for i in range(50)]},
+        'cards': [{
+            'id': rng.randint(10 ** 7, 10 ** 9),
+            'base_card_id': rng.randint(1, 600),
+            'power': rng.randint(5, 3000),
+            'level': rng.randint(1, 10),
+            'last_used_at': rng.randint(1.6e9, 1.7e9),
+            'created_at': rng.randint(1.6e9, 1.7e9),
+            'player_id': 1,
+            'fruit': {'id': rng.randint(1, 600), 'name': 'fruit', 'category': rng.randint(1, 5),
+                      'power_coef': rng.random(), 'rarity': rng.randint(1, 4)},
+        } for _ in range(cards)],
+        'buildings': [{'id': i, 'type': i % 7, 'level': rng.randint(1, 10), 'upgraded_at': 0} for i in range(30)],
+        'achievements': [{'id': i, 'progress': rng.random()} for i in range(200)],
+    }}
+
+
+def timeit(fn, payload, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(payload)
+    return (time.perf_counter() - start) / repeat
+
+
+def response_text(body, content_type):
+    # The old safe_load_json path: requests decodes .text first, running
+    # charset detection when the server does not name one.
+    response = Response()
+    response._content = body
+    if content_type:
+        response.headers['Content-Type'] = content_type
+    return json.loads(response.text)
+
+
+def retained(fn, body):
+    tracemalloc.start()
+    result = fn(body)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON decoding of game payloads')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--stdlib', action='store_true', help='ignore orjson even if it is installed')
+    args = parser.parse_args()
+    if args.stdlib:
+        decoding.orjson = None
+
+    rng = Random(1)
+    payloads = {
+        'battle/getopponents': (json.dumps(opponents_payload(rng), ensure_ascii=False).encode(), project_players),
+        'player/load': (json.dumps(load_payload(rng), ensure_ascii=False).encode(), project_load),
+    }
+
+    backend = 'orjson' if decoding.orjson is not None else 'json (stdlib)'
+    print(f'decode backend: {backend}')
+    for endpoint, (body, project) in payloads.items():
+        print(f'\n{endpoint}: {len(body) / 1024:.0f} KiB')
+        cases = (
+            ('response.text, no charset header', lambda b: response_text(b, None)),
+            ('response.text, application/json', lambda b: response_text(b, 'application/json')),
+            ('decode_json(bytes)', decode_json),
+            ('decode_json + projection', lambda b: project(decode_json(b))),
+        )
+        for name, fn in cases:
+            repeat = max(1, args.repeat // 10) if 'no charset' in name else args.repeat
+            elapsed = timeit(fn, body, repeat)
+            print(f'  {name:<34} {elapsed * 1000:8.2f} ms   retained {retained(fn, body) / 1024:8.0f} KiB')
+
+
+if __name__ == '__main__':
+    main()
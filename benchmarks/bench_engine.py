@@ -0,0 +1,144 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine
+import storage
+from engine import Engine, Reporter, account_config, battle, create_session, fetch_players_from_server, load
+from stub_server import add_arguments, game_from_args, start
+
+
+class BenchReporter(Reporter):
+    def __init__(self, account=0, stop_event=None):
+        super().__init__(account, stop_event)
+        self.status = None
+        self.counters = {}
+
+    def update_counters(self, **counters):
+        self.counters.update(counters)
+
+    def update_status(self, text):
+        self.status = text
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] if values else 0.0
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_calls(calls):
+    # One account, one call at a time: per-call latency as the engine sees
+    # it, including pacing and retries.
+    session = create_session()
+    reporter = BenchReporter()
+    q = load(session, 'bench-calls', reporter).get('data', {}).get('q', 0)
+    for name, call in (
+        ('load', lambda: load(session, 'bench-calls', reporter)),
+        ('getopponents', lambda: fetch_players_from_server(session, 0, reporter)),
+        ('battle', lambda: battle(session, 200000, q, [5000], reporter)),
+    ):
+        reporter.retries = 0
+        latencies = []
+        start_time = time.perf_counter()
+        for _ in range(calls):
+            started = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - started)
+        elapsed = time.perf_counter() - start_time
+        print(f'{name:>12}: {calls / elapsed:8.1f} calls/s  p50 {percentile(latencies, 50) * 1000:7.1f}ms  '
+              f'p99 {percentile(latencies, 99) * 1000:7.1f}ms  retries {reporter.retries}')
+    session.close()
+
+
+def bench_attack(game, accounts, duration, mode, attacks_per_player):
+    # Full run_account -> attack_offline loops, measured once every account
+    # has logged in and reached its battle loop.
+    configs = [account_config({
+        'restore_key': f'bench-{i}',
+        'attack_speed': 0,
+        'request_speed': 0,
+        'rest_after_attacks': 10 ** 9,
+        'attacks_per_player': attacks_per_player,
+        'min_level': 0,
+        'save_to_db': True,
+    }) for i in range(accounts)]
+    reporters = []
+
+    def reporter(account, stop_event):
+        channel = BenchReporter(account, stop_event)
+        reporters.append(channel)
+        return channel
+
+    rss_before = rss_mb()
+    runner = Engine(mode).start(configs, reporter)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline and sum(r.status == 'Attacking' for r in reporters) < accounts:
+        time.sleep(0.05)
+
+    writers = list(storage._writers.values())
+    battles = game.served('battle/battle', None)
+    rows = sum(w.rows_written for w in writers)
+    commits = sum(w.commits for w in writers)
+    started = time.perf_counter()
+    time.sleep(duration)
+    elapsed = time.perf_counter() - started
+    battles = game.served('battle/battle', None) - battles
+    rows = sum(w.rows_written for w in writers) - rows
+    commits = sum(w.commits for w in writers) - commits
+    rss_during = rss_mb()
+    runner.stop()
+
+    retries = sum(r.retries for r in reporters)
+    won = sum(r.counters.get('win', 0) for r in reporters)
+    print(f'{mode:>12}: {accounts} accounts, {battles / elapsed:8.1f} battles/s, {won} won, {retries} retries')
+    print(f'{"":>12}  DB {rows / elapsed:8.1f} rows/s in {commits / elapsed:.1f} commits/s, '
+          f'{(rss_during - rss_before) / accounts:.2f} MB RSS per account')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the engine against a local stub server')
+    add_arguments(parser)
+    parser.add_argument('--calls', type=int, default=200, help='sequential calls per endpoint')
+    parser.add_argument('--accounts', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of battle loop to measure')
+    parser.add_argument('--attacks-per-player', type=int, default=3)
+    parser.add_argument('--engine', choices=['thread', 'async', 'both'], default='both')
+    parser.add_argument('--pace', type=float, default=0.0, help='starting per-host request interval')
+    parser.add_argument('--pace-min', type=float, default=0.0, help='floor of the per-host request interval')
+    args = parser.parse_args()
+
+    server = start(game_from_args(args))
+    engine.url_base = server.url
+    engine.pace_interval = args.pace
+    engine.pace_min_interval = args.pace_min
+    engine.analyze_delay = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # League databases are created relative to the working directory.
+        os.chdir(tmp)
+        bench_calls(args.calls)
+        modes = ['thread', 'async'] if args.engine == 'both' else [args.engine]
+        for mode in modes:
+            if mode == 'async' and engine.aiohttp is None:
+                print(f'{mode:>12}: skipped, aiohttp is not installed')
+                continue
+            bench_attack(server.game, args.accounts, args.duration, mode, args.attacks_per_player)
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
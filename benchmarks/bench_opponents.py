@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import merge_enemies, round_size
+from selection import TargetSelector
+from storage import EnemyReader, create_or_open_db
+
+
+def fill(db_path, count):
+    conn, cursor = create_or_open_db(db_path)
+    now = time.time()
+    cursor.executemany('INSERT INTO Accounts (id, power, level, league, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?)',
+                       ((str(100000 + i), 50 + (i * 7919) % 20000, 10 + i % 40, 7, now, now) for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def as_dicts(reader, min_level, selector):
+    # The old round: every row fetched, turned into a dict, keyed by id to
+    # merge fresh opponents, then copied again by sorted().
+    rows = reader.connect().execute('SELECT id, power, level, league FROM Accounts WHERE level >= ? '
+                                    'ORDER BY power, level DESC, id', (min_level,)).fetchall()
+    enemies = [{'id': e[0], 'power': e[1], 'level': e[2], 'league': e[3]} for e in rows]
+    merged = {str(enemy['id']): enemy for enemy in enemies}
+    score = lambda e: selector.win_probability(e['id'], e['power']) * selector.expected_xp(e['id'])
+    return sorted(merged.values(), key=score, reverse=True)
+
+
+def as_tuples(reader, min_level, selector):
+    return selector.rank(merge_enemies(reader.iter_enemies(min_level), []))
+
+
+def streamed(reader, min_level, selector):
+    return selector.rank(merge_enemies(reader.iter_enemies(min_level), []), round_size)
+
+
+def measure(name, build, reader, min_level, selector, count):
+    tracemalloc.start()
+    started = time.perf_counter()
+    enemies = build(reader, min_level, selector)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'{name:>24}: {len(enemies):>7} in round, peak {peak / 2 ** 20:7.1f} MB '
+          f'({peak / count:6.0f} B per stored opponent), {elapsed * 1000:7.0f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory and time to start a round over a large opponent table')
+    parser.add_argument('--opponents', type=int, default=100000)
+    parser.add_argument('--min-level', type=int, default=0)
+    parser.add_argument('--power', type=int, default=10000, help='our power, for the win-probability prior')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        fill(db_path, args.opponents)
+        reader = EnemyReader(db_path)
+        selector = TargetSelector(args.power)
+        # Warm the page cache so every variant reads from memory.
+        reader.connect().execute('SELECT count(*) FROM Accounts').fetchone()
+        measure('dicts, full sort', as_dicts, reader, args.min_level, selector, args.opponents)
+        measure('namedtuples, full sort', as_tuples, reader, args.min_level, selector, args.opponents)
+        measure(f'streamed, top {round_size}', streamed, reader, args.min_level, selector, args.opponents)
+        reader.close()
+
+
+if __name__ == '__main__':
+    main()
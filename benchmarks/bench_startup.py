@@ -0,0 +1,35 @@
+import argparse
+import os
+import subprocess
+import sys
+from statistics import median
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def launch(splash):
+    # main.py prints one "Startup: step Nms, ..." line and quits when
+    # DARCOB_STARTUP_TIMING=exit.
+    env = dict(os.environ, DARCOB_STARTUP_TIMING='exit', DARCOB_SPLASH=str(splash), KIVY_NO_ARGS='1')
+    output = subprocess.run([sys.executable, os.path.join(root, 'main.py')], env=env, cwd=root,
+                            capture_output=True, text=True, timeout=120).stdout
+    for line in output.splitlines():
+        if line.startswith('Startup: '):
+            return {step: float(ms.rstrip('ms')) for step, ms in (part.split() for part in line[9:].split(', '))}
+    raise RuntimeError(f'no startup line in output:\n{output}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure app launch up to the first frame and Page1')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--splash', type=float, default=0.5, help='DARCOB_SPLASH for the runs, 0 to skip it')
+    args = parser.parse_args()
+
+    runs = [launch(args.splash) for _ in range(args.runs)]
+    for step in runs[0]:
+        values = [run[step] for run in runs if step in run]
+        print(f'{step:>12}: median {median(values):7.0f}ms  min {min(values):7.0f}ms  max {max(values):7.0f}ms')
+
+
+if __name__ == '__main__':
+    main()
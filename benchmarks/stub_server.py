@@ -0,0 +1,187 @@
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StubGame:
+    # Just enough of the game API for the engine: player/load,
+    # battle/getopponents and battle/battle. Every response can be delayed,
+    # turned into a 5xx, or into a 429 with Retry-After, at the given rates.
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1.0,
+                 players=50, league=7, win_rate=0.7, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.players = players
+        self.league = league
+        self.win_rate = win_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def count(self, endpoint, status):
+        with self.lock:
+            self.counts[endpoint, status] = self.counts.get((endpoint, status), 0) + 1
+
+    def served(self, endpoint, status=200):
+        with self.lock:
+            return sum(n for (e, s), n in self.counts.items() if e == endpoint and (status is None or s == status))
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+    def roll(self):
+        with self.lock:
+            return self.random.random()
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + self.jitter * (2 * self.roll() - 1)))
+
+    def fault(self):
+        r = self.roll()
+        if r < self.throttle_rate:
+            return 429
+        if r < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+    def load(self, form):
+        key = form.get('restore_key', [''])[0]
+        player_id = zlib.crc32(key.encode())
+        return {'status': True, 'data': {
+            'id': player_id,
+            'q': int(self.roll() * 1e9),
+            'name': f'stub-{player_id % 10000}',
+            'level': 40,
+            'gold': 1000,
+            'league_id': self.league,
+            'tribe': {'name': 'stub'},
+            'cards': [{'id': 5000 + i, 'power': 40 + i} for i in range(30)],
+        }}
+
+    def opponents(self):
+        return {'status': True, 'data': {'players': [
+            {'id': 200000 + i, 'name': f'enemy-{i}', 'def_power': 50 + 20 * i, 'level': 10 + i % 40,
+             'league_id': self.league, 'gold': 100, 'tribe_name': 'stub'}
+            for i in range(self.players)
+        ]}}
+
+    def battle(self, query):
+        won = self.roll() < self.win_rate
+        return {'status': True, 'data': {
+            'xp_added': 5 + int(self.roll() * 10) if won else 0,
+            'weekly_score': self.served('battle/battle'),
+            'q': int(self.roll() * 1e9),
+        }}
+
+    def handle(self, method, path, body):
+        url = urlsplit(path)
+        endpoint = url.path.strip('/')
+        self.delay()
+        status = self.fault()
+        if status == 429:
+            return endpoint, 429, {'status': False}, {'Retry-After': str(self.retry_after)}
+        if status:
+            return endpoint, status, {'status': False}, {}
+        if endpoint == 'player/load' and method == 'POST':
+            return endpoint, 200, self.load(parse_qs(body.decode())), {}
+        if endpoint == 'battle/getopponents':
+            return endpoint, 200, self.opponents(), {}
+        if endpoint == 'battle/battle':
+            return endpoint, 200, self.battle(parse_qs(url.query)), {}
+        return endpoint, 404, {'status': False}, {}
+
+
+def make_handler(game):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            # Headers and body go out in separate writes; without this, Nagle
+            # plus delayed ACKs add ~40ms to every keep-alive response.
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, *args):
+            pass
+
+        def respond(self, method):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            endpoint, status, payload, headers = game.handle(method, self.path, body)
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except ConnectionError:
+                # The client gave up (timeout or Stop) before we answered.
+                return
+            game.count(endpoint, status)
+
+        def do_GET(self):
+            self.respond('GET')
+
+        def do_POST(self):
+            self.respond('POST')
+
+    return Handler
+
+
+def start(game=None, host='127.0.0.1', port=0):
+    game = game or StubGame()
+    server = ThreadingHTTPServer((host, port), make_handler(game))
+    server.daemon_threads = True
+    server.game = game
+    server.url = f'http://{host}:{server.server_address[1]}/'
+    threading.Thread(target=server.serve_forever, daemon=True, name='StubServer').start()
+    return server
+
+
+def add_arguments(parser):
+    parser.add_argument('--latency', type=float, default=0.02, help='mean response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.01, help='+/- spread around --latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of 503 responses')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of 429 responses')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After sent with 429s')
+    parser.add_argument('--players', type=int, default=50, help='opponents per getopponents')
+    parser.add_argument('--win-rate', type=float, default=0.7)
+    parser.add_argument('--seed', type=int, default=None)
+
+
+def game_from_args(args):
+    return StubGame(args.latency, args.jitter, args.error_rate, args.throttle_rate, args.retry_after,
+                    args.players, win_rate=args.win_rate, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the game server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = start(game_from_args(args), args.host, args.port)
+    print(f'Serving on {server.url} (point DARCOB_URL_BASE or cli.py --url-base here)')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -19,7 +19,7 @@ source.include_exts = py,png,jpg,kv,atlas
 source.exclude_exts = spec
 
 # (list) List of directory to exclude (let empty to not exclude anything)
-source.exclude_dirs = tests, bin, venv, .git
+source.exclude_dirs = tests, bin, venv, .git, benchmarks
 
 # (list) List of exclusions using pattern matching
 source.exclude_patterns = license,*.md
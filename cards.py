@@ -0,0 +1,92 @@
+import heapq
+from time import time
+
+card_cooldown = 60
+card_reject_cooldown = 300
+
+
+class CardScheduler:
+    # Picks the card for each battle. Cards that are ready sit in a heap
+    # ordered by smoothed win rate, least recently used first on ties;
+    # after a battle a card moves to a second heap keyed by the time its
+    # cooldown ends. A rejected battle (no data in the response) puts the
+    # card on the longer card_reject_cooldown. If every card is cooling,
+    # the one that frees up first is used rather than waiting.
+    def __init__(self, cards, cooldown=None, reject_cooldown=None, prior_weight=2.0):
+        self.cooldown = card_cooldown if cooldown is None else cooldown
+        self.reject_cooldown = card_reject_cooldown if reject_cooldown is None else reject_cooldown
+        self.prior_weight = prior_weight
+        # id -> [uses, wins, losses, rejected, last_used, last_rejected]
+        self.stats = {card: [0, 0, 0, 0, 0.0, False] for card in cards}
+        self.ready = []
+        self.cooling = []
+        self.current = None
+        self.rebuild()
+
+    def __len__(self):
+        return len(self.stats)
+
+    def ids(self):
+        return list(self.stats)
+
+    def load(self, rows, now=None):
+        # (card, uses, wins, losses, rejected, last_used, last_rejected) rows
+        # saved by an earlier run; cards no longer in the deck are ignored.
+        for card, *stats in rows:
+            if card in self.stats:
+                self.stats[card] = [stats[0], stats[1], stats[2], stats[3], stats[4] or 0.0, bool(stats[5])]
+        self.rebuild(now)
+
+    def rebuild(self, now=None):
+        now = now or time()
+        self.current = None
+        self.ready = []
+        self.cooling = []
+        for card, stats in self.stats.items():
+            ready_at = stats[4] + (self.reject_cooldown if stats[5] else self.cooldown) if stats[4] else 0.0
+            if ready_at > now:
+                self.cooling.append((ready_at, card))
+            else:
+                self.ready.append(self.key(card))
+        heapq.heapify(self.ready)
+        heapq.heapify(self.cooling)
+
+    def win_rate(self, card):
+        wins, losses = self.stats[card][1:3]
+        return (wins + self.prior_weight * 0.5) / (wins + losses + self.prior_weight)
+
+    def key(self, card):
+        return (-self.win_rate(card), self.stats[card][4], card)
+
+    def pick(self, now=None):
+        # The same card is returned until record() is called for it, so a
+        # battle retried after an error goes out with the same card.
+        if self.current is not None:
+            return self.current
+        now = now or time()
+        while self.cooling and self.cooling[0][0] <= now:
+            heapq.heappush(self.ready, self.key(heapq.heappop(self.cooling)[1]))
+        if self.ready:
+            self.current = heapq.heappop(self.ready)[2]
+        elif self.cooling:
+            self.current = heapq.heappop(self.cooling)[1]
+        return self.current
+
+    def record(self, card, won=None, now=None):
+        # won is None when the server rejected the battle. Returns the row
+        # to persist for this card.
+        now = now or time()
+        stats = self.stats.get(card)
+        if stats is None:
+            return None
+        stats[0] += 1
+        stats[4] = now
+        stats[5] = won is None
+        if won is None:
+            stats[3] += 1
+        else:
+            stats[1 if won else 2] += 1
+        if self.current == card:
+            self.current = None
+            heapq.heappush(self.cooling, (now + (self.reject_cooldown if won is None else self.cooldown), card))
+        return (card, *stats)
@@ -0,0 +1,131 @@
+import re
+import sys
+import json
+import signal
+import argparse
+import threading
+from time import strftime, monotonic
+import engine
+from engine import Engine, Reporter, account_config
+from metrics import registry
+from journal import journal
+
+markup = re.compile(r'\[/?(?:color|b|i|u)(?:=[^\]]*)?\]')
+output_lock = threading.Lock()
+
+def plain(text):
+    return markup.sub('', text)
+
+def emit(text, out=sys.stdout):
+    with output_lock:
+        print(f'{strftime("%H:%M:%S")} {text}', file=out, flush=True)
+
+class ConsoleReporter(Reporter):
+    def __init__(self, account=0, stop_event=None, quiet=False):
+        super().__init__(account, stop_event)
+        self.quiet = quiet
+        self.status = 'Waiting'
+        self.counters = {}
+
+    def update_result(self, text):
+        if not self.quiet:
+            emit(f'#{self.account} {plain(text)}')
+
+    def update_counters(self, **counters):
+        self.counters.update(counters)
+
+    def update_status(self, text):
+        self.status = text
+        emit(f'#{self.account} [{text}] {self.summary()}')
+
+    def summary(self):
+        return ' '.join(f'{key}={value}' for key, value in self.counters.items())
+
+def read_accounts(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('accounts', [data])
+    if not isinstance(data, list) or not all(isinstance(values, dict) for values in data):
+        raise ValueError('expected a list of account objects')
+    configs = []
+    for i, values in enumerate(data):
+        # Profiles saved by the app carry 'selected'; deselected ones are skipped.
+        if not values.get('selected', True):
+            continue
+        try:
+            configs.append(account_config(values))
+        except ValueError as e:
+            raise ValueError(f'account {i + 1}: {e}') from None
+    return configs
+
+def positive(value):
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f'{value} is not a positive number')
+    return number
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run the battle loops headless, without Kivy.',
+        epilog='The accounts file is a JSON list of objects (or {"accounts": [...]}) '
+               'with the same fields as the app form: restore_key, power, min_level, '
+               'min_level_storage, attacks_per_player, rest_after_attacks, rest_duration, '
+               'attack_speed, request_speed, card_cooldown, card_reject_cooldown, save_to_db, resume. '
+               'The profiles file the app saves '
+               '(darcob_profiles.json) can be passed as is.'
+    )
+    parser.add_argument('accounts', help='JSON file with account configs')
+    parser.add_argument('--engine', choices=['thread', 'async'], default=engine.engine_mode)
+    parser.add_argument('--url-base', default=engine.url_base, help='game server root (default: %(default)s)')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='write a metrics snapshot here periodically and on exit (.json for JSON, else Prometheus text)')
+    parser.add_argument('--journal', metavar='PATH', default=journal.path,
+                        help='JSONL event journal, empty to disable (default: %(default)s)')
+    parser.add_argument('--metrics-interval', type=positive, default=30.0)
+    parser.add_argument('--quiet', action='store_true', help='only print status changes')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    engine.url_base = args.url_base.rstrip('/') + '/'
+    journal.path = args.journal
+    try:
+        configs = read_accounts(args.accounts)
+    except (OSError, ValueError) as e:
+        print(f'{args.accounts}: {e}', file=sys.stderr)
+        return 2
+    reporters = []
+
+    def reporter(account, stop_event):
+        channel = ConsoleReporter(account, stop_event, args.quiet)
+        reporters.append(channel)
+        return channel
+
+    runner = Engine(args.engine, log=lambda text: emit(plain(text)))
+
+    def stop(signum, frame):
+        emit('Stopping...')
+        runner.stop_event.set()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    runner.start(configs, reporter)
+    exported = monotonic()
+    while not runner.wait(1):
+        if not runner.is_running:
+            break
+        if args.metrics and monotonic() - exported >= args.metrics_interval:
+            registry.write(args.metrics)
+            exported = monotonic()
+    runner.stop(timeout=10)
+    if args.metrics:
+        emit(f'Metrics written to {registry.write(args.metrics)}')
+
+    for channel in reporters:
+        emit(f'#{channel.account} [{channel.status}] {channel.summary()}')
+    return 0 if reporters else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
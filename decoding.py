@@ -0,0 +1,49 @@
+from collections import namedtuple
+from json import loads as json_loads
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PlayerRecord = namedtuple('PlayerRecord', 'id def_power level league_id')
+CardRecord = namedtuple('CardRecord', 'id power')
+
+load_fields = ('id', 'q', 'name', 'level', 'gold', 'league_id')
+
+
+def loads_bytes(data):
+    # Works on the raw body: no charset detection, no intermediate str copy.
+    if orjson is not None:
+        return orjson.loads(data)
+    return json_loads(data)
+
+
+def decode_json(data):
+    try:
+        return loads_bytes(data)
+    except ValueError:
+        return None
+
+
+def project_players(payload, min_level=0):
+    # Ids become text here, as the DB stores them, so an opponent is the
+    # same key everywhere whether it came from the server or from a table.
+    if not isinstance(payload, dict) or 'data' not in payload:
+        return None
+    return [PlayerRecord(str(p['id']), p['def_power'], p['level'], p['league_id'])
+            for p in payload['data'].get('players', []) if p['level'] >= min_level]
+
+
+def project_load(payload):
+    # Keeps only what bootstrap and the battle loop read from player/load,
+    # so the full payload (hundreds of card dicts) can be freed right away.
+    if not isinstance(payload, dict):
+        return None
+    data = payload.get('data')
+    if not isinstance(data, dict):
+        return {'status': payload.get('status', False)}
+    projected = {key: data[key] for key in load_fields if key in data}
+    projected['tribe'] = {'name': (data.get('tribe') or {}).get('name')}
+    projected['cards'] = [CardRecord(c['id'], c['power']) for c in data.get('cards', [])]
+    return {'status': payload.get('status', False), 'data': projected}
@@ -0,0 +1,943 @@
+import os
+import socket
+import sqlite3
+import asyncio
+import weakref
+import threading
+from queue import Queue, Empty, Full
+from collections import namedtuple
+from contextlib import closing
+from time import monotonic
+from uuid import uuid4
+from hashlib import md5
+from requests import Session
+from requests.exceptions import ReadTimeout, ConnectionError, HTTPError
+from json import JSONDecodeError, loads
+from random import choice
+from requests.adapters import HTTPAdapter
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+from decoding import decode_json, project_load, project_players
+from retry import RetryCall, retry_policies, retry_after
+from pacing import pacer_for
+from selection import TargetSelector
+from cards import CardScheduler
+from metrics import registry
+from journal import journal
+from accounts import CancelToken, Reporter, account_config
+from storage import EnemyReader, Opponent, OpponentCache, acquire_writer, release_writer, league_db_path, enemies_from_players
+
+user_agents = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.93 Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 10; Pixel 3 XL) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.93 Mobile Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 11; Galaxy S21) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.93 Mobile Safari/537.36',
+]
+
+url_base = os.environ.get('DARCOB_URL_BASE', 'https://iran.fruitcraft.ir/')
+opponent_cache_ttl = 300
+pace_interval = 1.0
+pace_min_interval = 0.2
+checkpoint_interval = 5
+analyze_delay = 10
+harvest_interval = 60
+harvest_queue_size = 500
+round_size = 500
+harvest_wait = 5
+engine_mode = os.environ.get('DARCOB_ENGINE', 'thread')
+opponent_cache = OpponentCache(ttl=opponent_cache_ttl)
+
+def decode(data):
+    return '&'.join(f"{key}={value}" for key, value in data.items())
+
+def session_headers():
+    return {
+        'User-Agent': choice(user_agents),
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+        'Accept-Language': 'en-US,en;q=0.9',
+    }
+
+def tracked_pool(pool_cls, connections):
+    class TrackedConnection(pool_cls.ConnectionCls):
+        def connect(self):
+            connections.add(self)
+            super().connect()
+
+    return type(pool_cls.__name__, (pool_cls,), {'ConnectionCls': TrackedConnection})
+
+class TrackedAdapter(HTTPAdapter):
+    # Remembers every connection its pools open, so abort() can shut their
+    # sockets down from another thread: a request blocked on one fails at
+    # once instead of when its timeout runs out.
+    def __init__(self, **kwargs):
+        self.connections = weakref.WeakSet()
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: tracked_pool(pool_cls, self.connections)
+            for scheme, pool_cls in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+    def abort(self):
+        for connection in list(self.connections):
+            sock = getattr(connection, 'sock', None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+def create_session(proxies=None, cancel=None):
+    session = Session()
+    session.headers.update(session_headers())
+    # Retries are handled per call by request_with_retry, not by urllib3.
+    adapter = TrackedAdapter(max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if cancel is not None:
+        cancel.on_cancel(adapter.abort)
+    return session
+
+def safe_load_json(response):
+    return decode_json(response.content)
+
+def load_payload(restore_key):
+    return {
+        'game_version': '1.7.10655',
+        'device_name': 'unknown',
+        'os_version': '10',
+        'model': 'SM-A750F',
+        'udid': str(uuid4().int),
+        'store_type': 'iraqapps',
+        'restore_key': restore_key,
+        'os_type': 2
+    }
+
+def retry_message(error, wait_time):
+    if isinstance(error, Exception):
+        return f'[color=ffaa00]Connection issue: {error}. Waiting {wait_time:.1f}s...[/color]'
+    if error.status_code == 429:
+        return f'[color=ffaa00]Rate limit exceeded (429). Waiting {wait_time:.1f}s...[/color]'
+    return f'[color=ffaa00]Server error ({error.status_code}). Waiting {wait_time:.1f}s...[/color]'
+
+def observe_request(pacer, app_instance, endpoint, status, latency, retry_after=None):
+    pacer.observe(status, latency, retry_after)
+    labels = {'account': app_instance.account, 'endpoint': endpoint}
+    registry.observe('request_seconds', latency, **labels)
+    registry.inc('requests_total', status='error' if status is None else str(status), **labels)
+
+def pause(app_instance, kind, seconds):
+    # Every wait in the engine goes through here (or pause_async) so the
+    # time is accounted to what caused it: pacing, retry, speed, rest...
+    # Waiting on the stop event means Stop cuts any of them short.
+    if seconds > 0:
+        started = monotonic()
+        app_instance.stop_event.wait(seconds)
+        registry.inc('sleep_seconds_total', monotonic() - started, account=app_instance.account, kind=kind)
+
+async def pause_async(app_instance, kind, seconds):
+    if seconds > 0:
+        started = monotonic()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            registry.inc('sleep_seconds_total', monotonic() - started, account=app_instance.account, kind=kind)
+
+# The engine's logic is written once, as generators that yield these effects
+# instead of sleeping, sending requests or blocking on SQLite themselves.
+# run_steps performs them on a worker thread and run_steps_async on the
+# asyncio engine, so the threaded and the async account loops cannot drift
+# apart. A failed effect is raised back into the generator at its yield.
+Pause = namedtuple('Pause', 'kind seconds')
+Request = namedtuple('Request', 'method url timeout data')
+Blocking = namedtuple('Blocking', 'func args')
+
+# What a Request raises when the network or the server fails, for either
+# transport.
+timeout_errors = (ReadTimeout, asyncio.TimeoutError)
+transport_errors = timeout_errors + (ConnectionError,) + ((aiohttp.ClientConnectionError,) if aiohttp else ())
+
+def run_steps(steps, session, app_instance):
+    with closing(steps):
+        result = error = None
+        while True:
+            try:
+                effect = steps.send(result) if error is None else steps.throw(error)
+            except StopIteration as done:
+                return done.value
+            result = error = None
+            try:
+                if isinstance(effect, Pause):
+                    pause(app_instance, effect.kind, effect.seconds)
+                elif isinstance(effect, Request):
+                    result = session.request(effect.method, effect.url, data=effect.data, timeout=effect.timeout)
+                else:
+                    result = effect.func(*effect.args)
+            except BaseException as e:
+                error = e
+
+async def run_steps_async(steps, transport, app_instance):
+    # Blocking calls go to a worker thread: the event loop is shared by all
+    # accounts. A cancelled task raises CancelledError into the generator
+    # like any other error, so its cleanup still runs, effects included.
+    with closing(steps):
+        result = error = None
+        while True:
+            try:
+                effect = steps.send(result) if error is None else steps.throw(error)
+            except StopIteration as done:
+                return done.value
+            result = error = None
+            try:
+                if isinstance(effect, Pause):
+                    await pause_async(app_instance, effect.kind, effect.seconds)
+                elif isinstance(effect, Request):
+                    result = await transport.request(effect.method, effect.url, effect.timeout, data=effect.data)
+                else:
+                    result = await asyncio.to_thread(effect.func, *effect.args)
+            except BaseException as e:
+                error = e
+
+def defer(call, app_instance, action):
+    # The host pacer is holding past this call's budget (a long Retry-After,
+    # or many accounts queued on the host). Nothing is sent and the server is
+    # not blamed; the budget is waited out so a caller that tries again does
+    # not spin.
+    call.deferred = True
+    app_instance.update_result(f'[color=ffaa00]Host is rate limited, {action} deferred[/color]')
+    journal.event('deferred', account=app_instance.account, action=action, wait=round(call.remaining(), 3))
+
+def starved(error, timeout_error, timeout, policy):
+    # A timeout cut short by the call budget says nothing about the server.
+    return isinstance(error, timeout_error) and timeout < policy.timeout
+
+def request_steps(method, endpoint, app_instance, action, query='', data=None, call=None):
+    policy = retry_policies[endpoint]
+    pacer = pacer_for(url_base, pace_interval, pace_min_interval)
+    call = call or RetryCall(policy)
+    try:
+        for attempt in call:
+            if not app_instance.is_running:
+                break
+            app_instance.update_result(f'[color=ffaa00]Attempt {attempt}/{policy.attempts}: {action}...[/color]') 
+            app_instance.update_progress(attempt * (100 // policy.attempts))
+            wait_time = pacer.reserve(call.slot_limit())
+            if wait_time is None:
+                defer(call, app_instance, action)
+                yield Pause('pacing', call.remaining())
+                break
+            yield Pause('pacing', wait_time)
+            if not app_instance.is_running:
+                break
+            started = monotonic()
+            timeout = call.timeout()
+            try:
+                response = yield Request(method, f'{url_base}{endpoint}{query}', timeout, data)
+            except transport_errors as e:
+                if not app_instance.is_running:
+                    # Aborted by Stop, not a server problem.
+                    break
+                if not starved(e, timeout_errors, timeout, policy):
+                    observe_request(pacer, app_instance, endpoint, None, monotonic() - started)
+                error = e
+            else:
+                observe_request(pacer, app_instance, endpoint, response.status_code, monotonic() - started, retry_after(response))
+                if response.status_code not in policy.retry_statuses:
+                    response.raise_for_status()
+                    return response
+                error = response
+            wait_time = call.retry_delay(None if isinstance(error, Exception) else error)
+            if wait_time is None:
+                break
+            app_instance.update_result(retry_message(error, wait_time))
+            journal.event('retry', account=app_instance.account, endpoint=endpoint, attempt=attempt,
+                          status=None if isinstance(error, Exception) else error.status_code,
+                          error=str(error) if isinstance(error, Exception) else None, wait=round(wait_time, 3))
+            yield Pause('retry', wait_time)
+    except HTTPError as http_err:
+        app_instance.update_result(f'[color=ff5555]HTTP error: {http_err}[/color]')  
+    finally:
+        if call.retries:
+            registry.inc('retries_total', call.retries, account=app_instance.account, endpoint=endpoint)
+        app_instance.record_retries(endpoint, call.retries)
+    return None
+
+def load_steps(restore_key, app_instance):
+    data = load_payload(restore_key)
+    response = yield from request_steps('POST', 'player/load', app_instance, 'Connecting to server', data=decode(data))
+    if response is None:
+        app_instance.update_result('[color=ff5555]All connection attempts failed[/color]')  
+        return {'status': False}
+    result = project_load(safe_load_json(response))
+    if result is None:
+        app_instance.update_result('[color=ff5555]Error decoding JSON response[/color]') 
+        return {'status': False}
+    app_instance.update_result('[color=55ff55]Successfully connected![/color]')  
+    return result
+
+def load(session, restore_key, app_instance):
+    return run_steps(load_steps(restore_key, app_instance), session, app_instance)
+
+def fetch_players_steps(min_level, app_instance):
+    response = yield from request_steps('GET', 'battle/getopponents', app_instance, 'Fetching players')
+    filtered_players = project_players(safe_load_json(response), min_level) if response is not None else None
+    if filtered_players is None:
+        app_instance.update_result('[color=ff5555]Failed to fetch players[/color]') 
+        return []
+    app_instance.update_result(f'[color=55ff55]Fetched {len(filtered_players)} players[/color]') 
+    journal.event('opponents', account=app_instance.account, count=len(filtered_players), min_level=min_level,
+                  league=filtered_players[0].league_id if filtered_players else None)
+    return filtered_players
+
+def fetch_players_from_server(session, min_level, app_instance):
+    return run_steps(fetch_players_steps(min_level, app_instance), session, app_instance)
+
+def fetch_league_steps(league, app_instance):
+    # Only one account fetches a missing or expired league at a time; the
+    # others wait for its result instead of sending the same request.
+    if league is None:
+        players = yield from fetch_players_steps(0, app_instance)
+        if not players:
+            return None, []
+        league = players[0].league_id
+        opponent_cache.put(league, players)
+        return league, players
+    while True:
+        players = opponent_cache.get(league)
+        if players is not None:
+            return league, players
+        pending = opponent_cache.claim(league)
+        if pending is None:
+            break
+        yield Blocking(pending.wait, ())
+        if opponent_cache.get(league) is None:
+            return league, []
+    players = []
+    try:
+        players = yield from fetch_players_steps(0, app_instance)
+    finally:
+        opponent_cache.release(league, players)
+    return league, players
+
+def battle_payload(opponent_id, q, cards):
+    return {'opponent_id': opponent_id, 'check': md5(str(q).encode()).hexdigest(),
+            'cards': str(cards).replace(' ', ''), 'attacks_in_today': 0}
+
+# What battle() returns when the host pacer deferred it: nothing was sent.
+DEFERRED = object()
+
+def battle_steps(opponent_id, q, cards, app_instance):
+    data = battle_payload(opponent_id, q, cards)
+    call = RetryCall(retry_policies['battle/battle'])
+    response = yield from request_steps('GET', 'battle/battle', app_instance, f'Battling ID {opponent_id}', query='?' + decode(data), call=call)
+    if call.deferred:
+        return DEFERRED
+    if response is None:
+        app_instance.update_result('[color=ff5555]All battle attempts failed[/color]')  
+        return {}
+    result = safe_load_json(response)
+    if result is None:
+        # An HTML error page or an empty body: a failed battle, not one to
+        # send again at once.
+        app_instance.update_result('[color=ff5555]Error decoding battle response[/color]')
+        return {}
+    app_instance.update_result('[color=55ff55]Battle completed![/color]') 
+    return result
+
+def battle(session, opponent_id, q, cards, app_instance):
+    return run_steps(battle_steps(opponent_id, q, cards, app_instance), session, app_instance)
+
+class AttackState:
+    # Everything an account's battle loop carries between requests. Both the
+    # threaded and the asyncio loop drive the same state object.
+    def __init__(self, load_data, cards, selector, writer, app_instance, card_cooldown=None, card_reject_cooldown=None):
+        if 'data' not in load_data or 'q' not in load_data['data']:
+            app_instance.update_result('[color=ff5555]Error: \'q\' key not found. Using default_q[/color]') 
+            self.q = 'default_q'
+        else:
+            self.q = load_data['data']['q']
+        self.attacker = str(load_data.get('data', {}).get('id', ''))
+        self.app_instance = app_instance
+        self.cards = CardScheduler(cards, card_cooldown, card_reject_cooldown)
+        self.selector = selector
+        self.writer = writer
+        self.win = 0
+        self.lost = 0
+        self.xp = 0
+        self.doon = 0
+        self.attacked = {}
+        self.battles = {}
+        self.attack_count = 0
+        self.last_request = 0.0
+        self.position = 0
+        self.enemy_attacks = 0
+        self.last_checkpoint = 0.0
+
+    def resume(self, checkpoint):
+        # Returns the interrupted round's enemies, or None if there is
+        # nothing left to pick up. Counters carry over either way.
+        if checkpoint is None:
+            return None
+        if self.q == 'default_q' and checkpoint['q']:
+            self.q = checkpoint['q']
+        self.win = checkpoint['win']
+        self.lost = checkpoint['lost']
+        self.xp = checkpoint['xp']
+        self.doon = checkpoint['doon']
+        self.attack_count = checkpoint['attack_count']
+        self.attacked = loads(checkpoint['attacked']) if checkpoint['attacked'] else {}
+        self.app_instance.update_counters(win=self.win, lost=self.lost, doon=self.doon, xp=self.xp)
+
+        # Rounds saved before ids were normalized hold numeric ids.
+        enemies = [Opponent(str(e[0]), *e[1:]) for e in loads(checkpoint['round'] or '[]')]
+        if checkpoint['position'] >= len(enemies):
+            return None
+        self.position = checkpoint['position']
+        self.enemy_attacks = checkpoint['enemy_attacks']
+        self.app_instance.update_result(
+            f'[color=55ff55]Resuming at enemy {self.position + 1}/{len(enemies)}, '
+            f'attack {self.enemy_attacks + 1}[/color]'
+        )
+        return enemies
+
+    def start_round(self, enemies):
+        self.position = 0
+        self.enemy_attacks = 0
+        self.writer.save_round(self.attacker, enemies)
+        self.checkpoint(force=True)
+
+    def finish_enemy(self):
+        self.position += 1
+        self.enemy_attacks = 0
+        self.checkpoint(force=True)
+
+    def checkpoint(self, force=False):
+        now = monotonic()
+        if not force and now - self.last_checkpoint < checkpoint_interval:
+            return
+        self.last_checkpoint = now
+        self.writer.save_checkpoint(
+            self.attacker, self.q, self.win, self.lost, self.xp, self.doon, self.attack_count,
+            self.attacked, self.position, self.enemy_attacks
+        )
+
+    def report_enemies(self, enemies):
+        # One line for the log; the list itself goes to the enemies table.
+        self.app_instance.update_result(f'[color=55ff55]{len(enemies)} enemies available for attack[/color]')
+        self.app_instance.update_enemies(enemies)
+
+    def report_battle(self, enemy_id, result):
+        self.battles[enemy_id] = self.battles.get(enemy_id, 0) + 1
+        self.app_instance.update_enemy(enemy_id, self.battles[enemy_id], result)
+
+    def start_enemy(self, enemy):
+        if not self.enemy_attacks:
+            self.attacked[enemy.id] = 0
+        self.app_instance.update_result(
+            f'[color=55ff55]Attacking player ID: {enemy.id}...[/color] '
+            f'[color=55ff55]Level: {enemy.level}[/color]'
+        ) 
+
+    def record_card(self, won):
+        # Always persisted, whatever save_to_db says: it is what lets the
+        # next run (and a resumed one) keep the card order and cooldowns.
+        usage = self.cards.record(self.cards.current, won)
+        if usage:
+            self.writer.record_card(self.attacker, usage)
+
+    def record(self, enemy, q_response):
+        xp_added = q_response.get('data', {}).get('xp_added', 0)
+        card = self.cards.current
+        if 'data' not in q_response:
+            # An empty q_response never got an answer (network, timeout, an
+            # undecodable body) and keeps its card for the next battle. Only
+            # a reply without data is the server rejecting the card.
+            rejected = bool(q_response)
+            journal.event('battle_failed', account=self.app_instance.account, attacker=self.attacker, enemy=enemy.id,
+                          card=card, rejected=rejected)
+            if rejected:
+                self.record_card(None)
+            self.report_battle(enemy.id, 'failed')
+        else:
+            account = self.app_instance.account
+            journal.event('battle', account=account, attacker=self.attacker, enemy=enemy.id,
+                          power=enemy.power, level=enemy.level, won=xp_added > 0, xp_added=xp_added,
+                          weekly_score=q_response['data'].get('weekly_score'), card=card)
+            self.record_card(xp_added > 0)
+            self.report_battle(enemy.id, 'won' if xp_added > 0 else 'lost')
+            registry.inc('battles_total', account=account)
+            registry.inc('wins_total' if xp_added > 0 else 'losses_total', account=account)
+            registry.inc('xp_total', xp_added, account=account)
+            # Outcomes are learned state like card usage and checkpoints, so
+            # they are kept whatever save_to_db (the opponent list) says.
+            self.selector.record(enemy.id, enemy.power, xp_added > 0, xp_added)
+            self.writer.record_outcome(self.attacker, enemy.id, enemy.power, xp_added > 0, xp_added)
+
+        if xp_added > 0:
+            self.xp += xp_added
+            self.win += 1
+        else:
+            self.lost += 1
+            self.app_instance.update_counters(win=self.win, lost=self.lost, doon=self.doon, xp=self.xp)
+            return False
+
+        self.doon = q_response.get('data', {}).get('weekly_score', 0)
+        if 'data' in q_response and 'q' in q_response['data']:
+            self.q = q_response['data']['q']
+        self.attacked[enemy.id] = self.attacked.get(enemy.id, 0) + 1
+        self.app_instance.update_counters(win=self.win, lost=self.lost, doon=self.doon, xp=self.xp)
+        self.app_instance.update_result(
+            f'[color=55ff55]ID: {enemy.id}[/color] | '
+            f'[color=00ccff]Win: {self.win}[/color] | '
+            f'[color=ff5555]Lose: {self.lost}[/color] | '
+            f'[color=ffaa00]Doon: {self.doon}[/color] | '
+            f'[color=55ff55]XP: {self.xp}[/color]'
+        ) 
+        self.attack_count += 1
+        return True
+
+    def pause_left(self, gap):
+        # The account's own minimum gap between requests, counted from the
+        # start of the last one, so time spent waiting on the server or on
+        # the host pacer is not idled away a second time.
+        return max(0.0, self.last_request + gap - monotonic())
+
+def attack_steps(writer, db_file, league, max_power, min_level, cards, attacks_per_player, load_data, rest_after_attacks, rest_duration, speed, request_speed, app_instance, resume=False, targets=None, card_cooldown=None, card_reject_cooldown=None):
+    # Every SQLite read (and the round ranking that streams one) is a
+    # Blocking effect: on the asyncio engine one round over a large table
+    # would otherwise stall every other account's requests and timeouts.
+    # The reader is only used by this account, one call at a time, so it may
+    # move between pool threads.
+    selector = TargetSelector(max_power)
+    state = AttackState(load_data, cards, selector, writer, app_instance, card_cooldown, card_reject_cooldown)
+    reader = EnemyReader(db_file, check_same_thread=False)
+    try:
+        selector.load((yield Blocking(reader.outcomes, (state.attacker,))))
+        state.cards.load((yield Blocking(reader.card_usage, (state.attacker,))))
+        resumed = state.resume((yield Blocking(reader.checkpoint, (state.attacker,)))) if resume else None
+        while app_instance.is_running:
+            if resumed:
+                enemies, resumed = resumed, None
+                state.report_enemies(enemies)
+            else:
+                fresh = take_targets(targets, min_level, max_power or None)
+                enemies = yield Blocking(rank_stored, (selector, reader, fresh, min_level, max_power or None))
+                if not enemies:
+                    app_instance.update_result('[color=ffaa00]No enemies found in database[/color]') 
+                    cached = opponent_cache.get(league) or []
+                    enemies = selector.rank(enemies_from_players(cached, min_level, max_power or None), round_size)
+                if not enemies:
+                    app_instance.update_result(f'[color=ffaa00]Waiting {harvest_wait}s for the harvester to find opponents[/color]')
+                    yield Pause('starved', harvest_wait)
+                    continue
+                if fresh:
+                    app_instance.update_result(f'[color=55ff55]{len(fresh)} fresh opponents from the harvester[/color]')
+
+                state.report_enemies(enemies)
+                if selector.strong:
+                    app_instance.update_result(f'[color=cccccc]Skipping {len(selector.strong)} known-strong players[/color]')
+                app_instance.update_result(f'[color=cccccc]Analyzing players... Waiting {analyze_delay}s[/color]') 
+                yield Pause('analyze', analyze_delay)
+                state.start_round(enemies)
+
+            while state.position < len(enemies):
+                if not app_instance.is_running:
+                    break
+                enemy = enemies[state.position]
+                if selector.is_strong(enemy.id):
+                    state.finish_enemy()
+                    continue
+                state.start_enemy(enemy)
+
+                for i in range(state.enemy_attacks, attacks_per_player):
+                    if not app_instance.is_running:
+                        break
+                    try:
+                        state.last_request = monotonic()
+                        q_response = yield from battle_steps(enemy.id, state.q, [state.cards.pick()], app_instance)
+                        while q_response is DEFERRED and app_instance.is_running:
+                            q_response = yield from battle_steps(enemy.id, state.q, [state.cards.pick()], app_instance)
+                        if not app_instance.is_running:
+                            break
+                        if not state.record(enemy, q_response):
+                            break
+                        yield Pause('speed', state.pause_left(speed))
+                    except (KeyError, JSONDecodeError):
+                        app_instance.update_result('[color=ff5555]Error encountered. Retrying...[/color]')
+                        yield Pause('error', 2)
+                    except Exception as e:
+                        app_instance.update_result(f'[color=ff5555]Unexpected error: {e}[/color]')
+                        return
+                    state.enemy_attacks = i + 1
+                    state.checkpoint()
+                if not app_instance.is_running:
+                    break
+                state.finish_enemy()
+
+                wait_time = state.pause_left(request_speed)
+                app_instance.update_result(f'[color=cccccc]Finished attacking ID: {enemy.id}... Waiting {wait_time:.1f}s[/color]') 
+                yield Pause('request_speed', wait_time)
+
+                if state.attack_count >= rest_after_attacks:
+                    app_instance.update_result(f'[color=ffaa00]Resting for {rest_duration}s after {state.attack_count} attacks[/color]')
+                    journal.event('rest', account=app_instance.account, seconds=rest_duration, attacks=state.attack_count)
+                    yield Pause('rest', rest_duration)
+                    state.attack_count = 0
+    finally:
+        journal.event('session', account=app_instance.account, attacker=state.attacker,
+                      win=state.win, lost=state.lost, xp=state.xp, doon=state.doon)
+        if state.last_checkpoint:
+            state.checkpoint(force=True)
+        reader.close()
+
+def check_account(load_result, app_instance):
+    account_info = load_result['data']
+    tribe_name = account_info['tribe']['name']
+    app_instance.update_result('[color=55ff55]Connection successful![/color]')
+    app_instance.update_result(
+        f'[color=cccccc]Account Name: {account_info["name"]}[/color] | '
+        f'[color=55ff55]Level: {account_info["level"]}[/color] | '
+        f'[color=ffaa00]Gold: {account_info["gold"]}[/color] | '
+        f'[color=00ccff]Tribe: {tribe_name}[/color]'
+    )  # ترکیب رنگ‌ها
+
+    cards = [card.id for card in account_info['cards'] if card.power < 100]
+    journal.event('login', account=app_instance.account, ok=True, attacker=account_info.get('id'),
+                  level=account_info['level'], league=account_info.get('league_id'), cards=len(cards))
+    if len(cards) < 20:
+        app_instance.update_result('[color=ff5555]Account has less than 20 cards![/color]')
+        app_instance.update_status('Not enough cards')
+        return None
+    return cards
+
+def store_league_players(writer, db_file, players, config, app_instance):
+    app_instance.update_result(f'[color=cccccc]Using database file \'{db_file}\'[/color]')
+    if config['save_to_db']:
+        writer.upsert_players(players, config['min_level_storage'])
+        app_instance.update_result(f'[color=55ff55]{len(players)} players fetched and stored in database[/color]')
+
+def take_targets(targets, min_level, max_power=None):
+    # Never blocks: only what the harvester queued since the last round.
+    players = []
+    while targets is not None:
+        try:
+            players.append(targets.get_nowait())
+        except Empty:
+            break
+    return enemies_from_players(players, min_level, max_power)
+
+def rank_stored(selector, reader, fresh, min_level, max_power=None):
+    return selector.rank(merge_enemies(reader.iter_enemies(min_level, max_power), fresh), round_size)
+
+def merge_enemies(stored, fresh):
+    # Fresh harvester entries win over the stored row for the same id.
+    # Stored rows stream through; only the bounded fresh batch is held.
+    fresh_ids = {enemy.id for enemy in fresh}
+    yield from fresh
+    for enemy in stored:
+        if enemy.id not in fresh_ids:
+            yield enemy
+
+class Harvester(threading.Thread):
+    # Keeps one league's opponents fresh for every account attacking in it.
+    # Fetches at most once per interval (and through the shared host pacer),
+    # merges the result into the DB, where DBWriter drops unchanged rows, and
+    # offers new or changed opponents to each account's bounded queue. A
+    # full queue just drops the rest: they are in the DB and the cache.
+    def __init__(self, league, writer, interval=None, queue_size=None):
+        super().__init__(daemon=True, name=f'Harvester({league})')
+        self.league = league
+        self.writer = writer
+        self.interval = interval or harvest_interval
+        self.queue_size = queue_size or harvest_queue_size
+        self.reporter = Reporter(f'harvest-{league}')
+        self.session = create_session(cancel=self.reporter.stop_event)
+        self.lock = threading.Lock()
+        self.queues = []
+        self.seen = {}
+        self.storage_level = None
+        self.users = 0
+        self.harvests = 0
+
+    def stop(self):
+        self.reporter.stop_event.set()
+
+    def subscribe(self, players, config):
+        with self.lock:
+            if config['save_to_db'] and (self.storage_level is None or config['min_level_storage'] < self.storage_level):
+                self.storage_level = config['min_level_storage']
+            for p in players:
+                self.seen[p.id] = (p.def_power, p.level)
+            targets = Queue(maxsize=self.queue_size)
+            self.queues.append(targets)
+        return targets
+
+    def unsubscribe(self, targets):
+        with self.lock:
+            if targets in self.queues:
+                self.queues.remove(targets)
+
+    def publish(self, players):
+        with self.lock:
+            fresh = [p for p in players if self.seen.get(p.id) != (p.def_power, p.level)]
+            for p in fresh:
+                self.seen[p.id] = (p.def_power, p.level)
+            queues = list(self.queues)
+        for targets in queues:
+            for p in fresh:
+                try:
+                    targets.put_nowait(p)
+                except Full:
+                    break
+        return fresh
+
+    def harvest(self):
+        players = fetch_players_from_server(self.session, 0, self.reporter)
+        if not players or not self.reporter.is_running:
+            return
+        self.harvests += 1
+        opponent_cache.put(self.league, players)
+        if self.storage_level is not None:
+            self.writer.upsert_players(players, self.storage_level)
+        fresh = self.publish(players)
+        journal.event('harvest', league=self.league, count=len(players), fresh=len(fresh))
+
+    def run(self):
+        while not self.reporter.stop_event.wait(self.interval):
+            self.harvest()
+        self.session.close()
+
+
+_harvesters = {}
+_harvesters_lock = threading.Lock()
+
+def acquire_harvester(league, writer):
+    with _harvesters_lock:
+        harvester = _harvesters.get(league)
+        if harvester is None or not harvester.is_alive():
+            harvester = _harvesters[league] = Harvester(league, writer)
+            harvester.start()
+        harvester.users += 1
+        return harvester
+
+def release_harvester(harvester):
+    with _harvesters_lock:
+        harvester.users -= 1
+        if harvester.users > 0:
+            return
+        if _harvesters.get(harvester.league) is harvester:
+            del _harvesters[harvester.league]
+    harvester.stop()
+
+def account_steps(config, app_instance):
+    # Bootstrap and battle loop of one account.
+    registry.start(app_instance.account)
+    app_instance.update_status('Logging in')
+    load_result = yield from load_steps(config['restore_key'], app_instance)
+    if not app_instance.is_running:
+        app_instance.update_status('Stopped')
+        return
+    if not load_result.get('status', False):
+        app_instance.update_result('[color=ff5555]Connection failed![/color]')
+        journal.event('login', account=app_instance.account, ok=False)
+        app_instance.update_status('Login failed')
+        return
+    cards = check_account(load_result, app_instance)
+    if cards is None or not app_instance.is_running:
+        return
+
+    app_instance.update_status('Fetching opponents')
+    league, players = yield from fetch_league_steps(load_result['data'].get('league_id'), app_instance)
+    if not app_instance.is_running:
+        app_instance.update_status('Stopped')
+        return
+    if not players:
+        app_instance.update_result('[color=ff5555]No players fetched from server![/color]')
+        app_instance.update_status('No opponents')
+        return
+
+    db_file = league_db_path(league)
+    # Opening the writer waits for its migrations (a VACUUM, once).
+    try:
+        writer = yield Blocking(acquire_writer, (db_file,))
+    except (sqlite3.Error, OSError) as e:
+        app_instance.update_result(f'[color=ff5555]Cannot open database \'{db_file}\': {e}[/color]')
+        app_instance.update_status('Database error')
+        return
+    harvester = acquire_harvester(league, writer)
+    targets = harvester.subscribe(players, config)
+    try:
+        store_league_players(writer, db_file, players, config, app_instance)
+        app_instance.update_status('Attacking')
+        yield from attack_steps(
+            writer, db_file, league,
+            config['power'], config['min_level'], cards,
+            config['attacks_per_player'], load_result,
+            config['rest_after_attacks'], config['rest_duration'],
+            config['attack_speed'], config['request_speed'],
+            app_instance, config['resume'], targets,
+            config['card_cooldown'], config['card_reject_cooldown']
+        )
+    finally:
+        harvester.unsubscribe(targets)
+        release_harvester(harvester)
+        # Closing the writer drains its queue: a blocking call, and made even
+        # while a stopped account unwinds.
+        yield Blocking(release_writer, (writer,))
+        app_instance.update_status('Stopped')
+
+def run_account(config, app_instance):
+    # Runs on its own worker thread so a slow login never holds up the UI or
+    # the other accounts.
+    with create_session(cancel=app_instance.stop_event) as session:
+        run_steps(account_steps(config, app_instance), session, app_instance)
+
+class AsyncResponse:
+    def __init__(self, status_code, content, headers, reason=''):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.reason = reason
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError(f'{self.status_code} {self.reason}', response=self)
+
+class AsyncTransport:
+    # aiohttp counterpart of create_session().
+    def __init__(self, headers, cookies=None):
+        self.headers = dict(headers)
+        self.cookies = cookies or {}
+        self.session = None
+
+    async def request(self, method, url, timeout, data=None):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(headers=self.headers, cookies=self.cookies)
+        async with self.session.request(method, url, data=data, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            return AsyncResponse(response.status, await response.read(), response.headers, response.reason or '')
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+async def run_account_async(config, app_instance):
+    transport = AsyncTransport(session_headers())
+    try:
+        await run_steps_async(account_steps(config, app_instance), transport, app_instance)
+    finally:
+        await transport.close()
+
+class AsyncEngine:
+    # One event loop on a background thread runs every account's battle loop
+    # as a task. Stopping cancels the tasks, which interrupts any pending
+    # asyncio.sleep or request immediately.
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run, daemon=True, name='AsyncEngine')
+        self.tasks = set()
+
+    def run(self):
+        self.loop.run_forever()
+        self.loop.close()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def submit(self, coro):
+        async def run():
+            task = asyncio.current_task()
+            self.tasks.add(task)
+            try:
+                await coro
+            finally:
+                self.tasks.discard(task)
+        return asyncio.run_coroutine_threadsafe(run(), self.loop)
+
+    async def shutdown(self):
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.loop.stop()
+
+    def cancel(self):
+        # Does not wait: the tasks unwind and the loop stops and closes on
+        # its own thread.
+        try:
+            asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop)
+        except RuntimeError:
+            pass
+
+    def stop(self, timeout=10):
+        self.cancel()
+        self.thread.join(timeout)
+
+class Engine:
+    # Runs one battle loop per account, either on its own thread or as a task
+    # on a shared AsyncEngine. All of them share one stop event.
+    def __init__(self, mode=None, log=None):
+        self.mode = mode or engine_mode
+        self.log = log or (lambda text: None)
+        self.stop_event = CancelToken()
+        self.threads = []
+        self.futures = []
+        self.loop = None
+
+    @property
+    def is_running(self):
+        return not self.stop_event.is_set()
+
+    def start(self, configs, reporter=Reporter):
+        registry.reset()
+        if self.mode == 'async' and aiohttp is None:
+            self.log('[color=ffaa00]aiohttp is not installed, falling back to threads[/color]')
+        elif self.mode == 'async':
+            self.loop = AsyncEngine().start()
+            self.log('[color=cccccc]Running accounts on the asyncio engine[/color]')
+
+        for i, config in enumerate(configs):
+            if not config['restore_key']:
+                self.log(f'[color=ff5555]Error: Account {i + 1} is invalid (no restore key)![/color]')
+                continue
+
+            channel = reporter(i + 1, self.stop_event)
+            if self.loop:
+                self.futures.append(self.loop.submit(run_account_async(config, channel)))
+                continue
+
+            thread = threading.Thread(target=run_account, args=(config, channel), daemon=True, name=f'Account-{i + 1}')
+            self.threads.append(thread)
+            thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        for thread in self.threads:
+            thread.join(timeout)
+        for future in self.futures:
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+        return not any(t.is_alive() for t in self.threads) and all(f.done() for f in self.futures)
+
+    def cancel(self):
+        # Returns at once. Waits end, requests on the wire are aborted, and
+        # each worker closes its session and releases its DB writer on its
+        # own thread while unwinding.
+        self.stop_event.set()
+        if self.loop:
+            self.loop.cancel()
+
+    def stop(self, timeout=10):
+        self.cancel()
+        self.wait(timeout)
+        if self.loop:
+            self.loop.thread.join(timeout)
+        journal.flush(timeout)
@@ -0,0 +1,234 @@
+import os
+import sys
+import json
+import atexit
+import argparse
+import threading
+from queue import Queue, Empty
+from time import time, monotonic
+
+
+class Journal:
+    # Append-only JSONL record of what the engine did. event() only queues a
+    # dict; one background thread serializes, writes through a buffered file
+    # and flushes at most every flush_interval seconds. The file is rotated
+    # to path.1 .. path.<backups> before a line would take it past max_bytes.
+    def __init__(self, path, max_bytes=5 * 2 ** 20, backups=3, flush_interval=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.queue = Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+
+    def event(self, kind, **fields):
+        if not self.path:
+            return
+        self.queue.put({'ts': round(time(), 3), 'event': kind, **fields})
+        if self.thread is None:
+            self.start()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True, name='Journal')
+                self.thread.start()
+        return self
+
+    def flush(self, timeout=5):
+        if self.thread is None:
+            return True
+        if not self.thread.is_alive():
+            return False
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def rotate(self, f):
+        f.close()
+        try:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f'{self.path}.{i}'):
+                    os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+            if self.backups:
+                os.replace(self.path, f'{self.path}.1')
+            else:
+                os.remove(self.path)
+        except OSError as e:
+            self.errors += 1
+            self.last_error = e
+        return self.open()
+
+    def open(self):
+        # None if the file cannot be opened (a missing directory, no
+        # permission): the thread then keeps draining the queue and dropping
+        # events, so event() never piles them up and flush() never hangs.
+        try:
+            return open(self.path, 'a', encoding='utf-8')
+        except OSError as e:
+            self.errors += 1
+            self.last_error = e
+            return None
+
+    def run(self):
+        f = self.open()
+        size = f.tell() if f else 0
+        flushed = monotonic()
+        running = True
+        while running:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            waiters = []
+            try:
+                for item in batch:
+                    if item is None:
+                        running = False
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    elif f is None:
+                        self.dropped += 1
+                    else:
+                        line = json.dumps(item, separators=(',', ':'), ensure_ascii=False) + '\n'
+                        if size and size + len(line) > self.max_bytes:
+                            f = self.rotate(f)
+                            size = 0
+                        f.write(line)
+                        size += len(line)
+                        self.written += 1
+                if f and (waiters or not running or monotonic() - flushed >= self.flush_interval):
+                    f.flush()
+                    flushed = monotonic()
+            except (OSError, TypeError, ValueError) as e:
+                self.errors += 1
+                self.last_error = e
+            for waiter in waiters:
+                waiter.set()
+        if f:
+            f.close()
+
+
+journal = Journal(os.environ.get('DARCOB_JOURNAL', 'darcob_journal.jsonl'))
+atexit.register(journal.close, 5)
+
+
+def journal_files(path):
+    # Oldest first: path.N, ..., path.1, path.
+    files = []
+    i = 1
+    while os.path.exists(f'{path}.{i}'):
+        files.append(f'{path}.{i}')
+        i += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def iter_events(path):
+    for name in journal_files(path):
+        with open(name, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A torn last line from a killed process.
+                    continue
+
+
+session_gap = 1800
+
+
+def close_span(account, end=None):
+    if account['start'] is not None:
+        account['seconds'] += (end or account['last']) - account['start']
+        account['start'] = None
+
+
+def analyze(events, band=1000, gap=None):
+    # One pass, constant memory: only per-attacker and per-band totals are
+    # kept. The journal spans many runs and a UI slot can hold different
+    # players from one run to the next, so battles are grouped by attacker
+    # and throughput is over the time actually spent battling: a span ends
+    # at the attacker's 'session' event, or at a silence longer than gap
+    # for runs that were killed before writing one.
+    gap = session_gap if gap is None else gap
+    accounts = {}
+    bands = {}
+    counts = {}
+    for event in events:
+        kind = event.get('event')
+        counts[kind] = counts.get(kind, 0) + 1
+        if kind == 'session' and event.get('attacker') in accounts:
+            close_span(accounts[event['attacker']], event['ts'])
+        if kind != 'battle':
+            continue
+        ts = event['ts']
+        attacker = event.get('attacker') or f'slot {event.get("account")}'
+        account = accounts.setdefault(attacker, {'battles': 0, 'wins': 0, 'xp': 0, 'sessions': 0,
+                                                 'seconds': 0.0, 'start': None, 'last': ts})
+        if account['start'] is not None and ts - account['last'] > gap:
+            close_span(account)
+        if account['start'] is None:
+            account['start'] = ts
+            account['sessions'] += 1
+        account['last'] = ts
+        account['battles'] += 1
+        account['wins'] += bool(event.get('won'))
+        account['xp'] += event.get('xp_added', 0)
+        power = event.get('power')
+        key = int(power // band * band) if isinstance(power, (int, float)) else None
+        totals = bands.setdefault(key, [0, 0, 0])
+        totals[0] += 1
+        totals[1] += bool(event.get('won'))
+        totals[2] += event.get('xp_added', 0)
+    for account in accounts.values():
+        close_span(account)
+    return {'events': counts, 'accounts': accounts, 'bands': bands}
+
+
+def print_report(report, band, out=sys.stdout):
+    print('Events: ' + ', '.join(f'{kind}={n}' for kind, n in sorted(report['events'].items(), key=str)), file=out)
+    print(f'{"attacker":>10} {"sessions":>8} {"battles":>8} {"win%":>6} {"xp":>8} {"hours":>7} {"battles/h":>10} {"xp/h":>8}', file=out)
+    for attacker, totals in sorted(report['accounts'].items(), key=lambda item: str(item[0])):
+        hours = max(totals['seconds'], 1.0) / 3600
+        print(f'{str(attacker):>10} {totals["sessions"]:>8} {totals["battles"]:>8} {100 * totals["wins"] / totals["battles"]:>6.1f} '
+              f'{totals["xp"]:>8} {hours:>7.2f} {totals["battles"] / hours:>10.1f} {totals["xp"] / hours:>8.1f}', file=out)
+    print(f'{"power":>14} {"battles":>8} {"win%":>6} {"xp/battle":>10}', file=out)
+    for key, (battles, wins, xp) in sorted(report['bands'].items(), key=lambda item: (item[0] is None, item[0] or 0)):
+        label = 'unknown' if key is None else f'{key}-{key + band - 1}'
+        print(f'{label:>14} {battles:>8} {100 * wins / battles:>6.1f} {xp / battles:>10.1f}', file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize a battle journal: throughput and win rate by power band')
+    parser.add_argument('path', nargs='?', default=journal.path or 'darcob_journal.jsonl',
+                        help='journal file; rotated backups next to it are read too')
+    parser.add_argument('--band', type=int, default=1000, help='width of a power band')
+    parser.add_argument('--gap', type=float, default=session_gap,
+                        help='seconds without a battle that end a session when no session event was written')
+    args = parser.parse_args(argv)
+    if not journal_files(args.path):
+        parser.error(f'no journal at {args.path}')
+    print_report(analyze(iter_events(args.path), args.band, args.gap), args.band)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,288 +1,68 @@
 import os
-import sqlite3
-import threading
-from time import sleep
-from uuid import uuid4
-from hashlib import md5
-from requests import Session
-from requests.exceptions import ReadTimeout, ConnectionError, HTTPError
-from json import loads, JSONDecodeError
-from random import choice
+from time import monotonic, perf_counter
+
+
+class StartupTimer:
+    # DARCOB_STARTUP_TIMING=1 prints how long launch took up to each step;
+    # =exit also quits once Page1 is up, for scripted runs.
+    def __init__(self, mode):
+        self.mode = mode
+        self.started = perf_counter()
+        self.marks = {}
+
+    def mark(self, step):
+        self.marks.setdefault(step, perf_counter() - self.started)
+
+    def done(self, *steps):
+        return all(step in self.marks for step in steps)
+
+    def report(self):
+        print('Startup: ' + ', '.join(f'{step} {seconds * 1000:.0f}ms' for step, seconds in self.marks.items()), flush=True)
+
+
+startup = StartupTimer(os.environ.get('DARCOB_STARTUP_TIMING'))
+
+from collections import deque
+from threading import Lock, Thread
+from importlib import import_module
+from kivy.config import Config
+# Set before the Clock exists: a text UI needs no more frames than this, and
+# the CPU is left to the engine.
+Config.set('graphics', 'maxfps', '30')
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.textinput import TextInput
-from kivy.uix.spinner import Spinner
+from kivy.uix.togglebutton import ToggleButton
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.progressbar import ProgressBar
 from kivy.uix.gridlayout import GridLayout
-from kivy.properties import StringProperty, NumericProperty, ColorProperty
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.tabbedpanel import TabbedPanel, TabbedPanelItem
+from kivy.properties import StringProperty, NumericProperty, ColorProperty, ListProperty
 from kivy.core.window import Window
 from kivy.metrics import dp
 from kivy.graphics import Color, Rectangle, RoundedRectangle
 from kivy.clock import Clock
+from kivy.logger import Logger
 from kivy.animation import Animation
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
-
-user_agents = [
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36',
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.93 Safari/537.36',
-    'Mozilla/5.0 (Linux; Android 10; Pixel 3 XL) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.93 Mobile Safari/537.36',
-    'Mozilla/5.0 (Linux; Android 11; Galaxy S21) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.93 Mobile Safari/537.36',
-]
-
-url_base = 'https://iran.fruitcraft.ir/'
+from accounts import Reporter, account_config
+from metrics import registry
+from profiles import ProfileStore, profile_fields, profile_name, valid_field
+
+log_max_lines = 1000
+ui_batch_limit = 2000
+stats_interval = 1.0
+idle_stats_interval = 10.0
+stats_export_path = 'darcob_metrics'
+idle_after = 5.0
+pause_key = 289  # F8 simulates going to the background and back on desktop
+splash_duration = float(os.environ.get('DARCOB_SPLASH', 0.5))  # 0 skips the splash
 Window.clearcolor = (0.05, 0.05, 0.15, 1)  
 
-def decode(data):
-    return '&'.join(f"{key}={value}" for key, value in data.items())
-
-def create_session(proxies=None):
-    session = Session()
-    session.headers.update({
-        'User-Agent': choice(user_agents),
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
-        'Accept-Language': 'en-US,en;q=0.9',
-    })
-    retries = Retry(total=5, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
-    session.mount('http://', HTTPAdapter(max_retries=retries))
-    session.mount('https://', HTTPAdapter(max_retries=retries))
-    return session
-
-def safe_load_json(response):
-    try:
-        return loads(response.text)
-    except JSONDecodeError:
-        return None
-
-def load(session, restore_key, app_instance):
-    data = {
-        'game_version': '1.7.10655',
-        'device_name': 'unknown',
-        'os_version': '10',
-        'model': 'SM-A750F',
-        'udid': str(uuid4().int),
-        'store_type': 'iraqapps',
-        'restore_key': restore_key,
-        'os_type': 2
-    }
-    attempts = 5
-    for attempt in range(attempts):
-        app_instance.update_result(f'[color=ffaa00]Attempt {attempt + 1}/{attempts}: Connecting to server...[/color]') 
-        app_instance.update_progress((attempt + 1) * (100 // attempts))
-        try:
-            response = session.post(f'{url_base}player/load', data=decode(data), timeout=5)
-            response.raise_for_status()
-            result = safe_load_json(response)
-            if result is None:
-                app_instance.update_result('[color=ff5555]Error decoding JSON response[/color]') 
-                return {'status': False}
-            app_instance.update_result('[color=55ff55]Successfully connected![/color]')  
-            return result
-        except (ReadTimeout, ConnectionError) as e:
-            wait_time = 5 * (attempt + 1)
-            app_instance.update_result(f'[color=ffaa00]Connection issue: {e}. Waiting {wait_time}s...[/color]')  
-            sleep(wait_time)
-        except HTTPError as http_err:
-            app_instance.update_result(f'[color=ff5555]HTTP error: {http_err}[/color]')  
-            break
-    app_instance.update_result('[color=ff5555]All connection attempts failed[/color]')  
-    return {'status': False}
-
-def fetch_players_from_server(session, min_level, app_instance):
-    attempts = 5
-    for attempt in range(attempts):
-        app_instance.update_result(f'[color=ffaa00]Attempt {attempt + 1}/{attempts}: Fetching players...[/color]') 
-        app_instance.update_progress((attempt + 1) * (100 // attempts))
-        try:
-            response = session.get(f'{url_base}battle/getopponents', timeout=5)
-            response.raise_for_status()
-            players_data = safe_load_json(response)
-            if players_data and 'data' in players_data:
-                players = players_data['data'].get('players', [])
-                filtered_players = [{
-                    'id': p['id'],
-                    'def_power': p['def_power'],
-                    'level': p['level'],
-                    'league_id': p['league_id'],
-                    'gold': p['gold'],
-                    'name': p['name'],
-                    'tribe': p['tribe_name']
-                } for p in players if p['level'] >= min_level]
-                app_instance.update_result(f'[color=55ff55]Fetched {len(filtered_players)} players[/color]') 
-                return filtered_players
-        except (ReadTimeout, ConnectionError) as e:
-            wait_time = 5 * (attempt + 1)
-            app_instance.update_result(f'[color=ffaa00]Error fetching players: {e}. Retrying in {wait_time}s...[/color]') 
-            sleep(wait_time)
-        except HTTPError as http_err:
-            app_instance.update_result(f'[color=ff5555]HTTP error: {http_err}[/color]')  
-            break
-    app_instance.update_result('[color=ff5555]Failed to fetch players[/color]') 
-    return []
-
-def create_or_open_db(db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS Accounts (
-                        id TEXT UNIQUE,
-                        power NUMERIC,
-                        level NUMERIC,
-                        league NUMERIC,
-                        PRIMARY KEY(id))''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS StrongPlayers (
-                        id TEXT UNIQUE,
-                        PRIMARY KEY(id))''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS WeakPlayers (
-                        id TEXT UNIQUE,
-                        PRIMARY KEY(id))''')
-    conn.commit()
-    return conn, cursor
-
-
-def update_players_in_db(cursor, players, min_level_for_storage):
-    for player in players:
-        if player['level'] >= min_level_for_storage:
-            cursor.execute('''INSERT INTO Accounts (id, power, level, league)
-                              VALUES (?, ?, ?, ?)
-                              ON CONFLICT(id) DO UPDATE SET
-                                  power=excluded.power,
-                                  level=excluded.level,
-                                  league=excluded.league''',
-                           (player['id'], player['def_power'], player['level'], player['league_id']))
-
-
-def get_enemies_from_db(db_path, min_level):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, power, level, league FROM Accounts WHERE level >= ?', (min_level,))
-    enemies = cursor.fetchall()
-    conn.close()
-    return [{'id': e[0], 'power': e[1], 'level': e[2], 'league': e[3]} for e in enemies]
-
-
-def battle(session, opponent_id, q, cards, app_instance):
-    data = {'opponent_id': opponent_id, 'check': md5(str(q).encode()).hexdigest(),
-            'cards': str(cards).replace(' ', ''), 'attacks_in_today': 0}
-    attempts = 5
-    for attempt in range(attempts):
-        app_instance.update_result(f'[color=ffaa00]Attempt {attempt + 1}/{attempts}: Battling ID {opponent_id}...[/color]') 
-        app_instance.update_progress((attempt + 1) * (100 // attempts))
-        try:
-            response = session.get(f'{url_base}battle/battle?' + decode(data), timeout=5)
-            response.raise_for_status()
-            if response.status_code == 429:
-                app_instance.update_result('[color=ffaa00]Rate limit exceeded (429). Pausing for 60s...[/color]') 
-                sleep(60)
-                return {}
-            app_instance.update_result('[color=55ff55]Battle completed![/color]') 
-            return safe_load_json(response)
-        except (ReadTimeout, ConnectionError) as e:
-            wait_time = 30
-            app_instance.update_result(f'[color=ffaa00]Connection issue in battle: {e}. Waiting {wait_time}s...[/color]')  
-            sleep(wait_time)
-        except HTTPError as http_err:
-            app_instance.update_result(f'[color=ff5555]HTTP error: {http_err}[/color]') 
-            break
-    app_instance.update_result('[color=ff5555]All battle attempts failed[/color]')  
-    return {}
-
-def attack_offline(session, cursor, db_file, max_power, min_level, cards, attacks_per_player, load_data, rest_after_attacks, rest_duration, speed, request_speed, save_to_db, app_instance):
-    if 'data' not in load_data or 'q' not in load_data['data']:
-        app_instance.update_result('[color=ff5555]Error: \'q\' key not found. Using default_q[/color]') 
-        q = 'default_q'
-    else:
-        q = load_data['data']['q']
-
-    win = 0
-    lost = 0
-    xp = 0
-    doon = 0
-    attacked = {}
-    attack_count = 0
-
-    while app_instance.is_running:
-        enemies = get_enemies_from_db(db_file, min_level)
-        if not enemies:
-            app_instance.update_result('[color=ffaa00]No enemies found in database[/color]') 
-            enemies = fetch_players_from_server(session, min_level, app_instance)
-            if save_to_db:
-                update_players_in_db(cursor, enemies, min_level)
-                cursor.connection.commit()
-            if not enemies:
-                app_instance.update_result('[color=ff5555]No players fetched from server[/color]') 
-                return
-
-        enemies.sort(key=lambda x: (x['power'], -x['level']))
-        app_instance.update_result('[color=55ff55]Enemies available for attack:[/color]')  
-        app_instance.update_result('[color=cccccc]================[/color]') 
-        for enemy in enemies:
-            app_instance.update_result(
-                f'[color=00ccff]ID: {enemy["id"]}[/color] | '
-                f'[color=ffaa00]Power: {enemy["power"]}[/color] | '
-                f'[color=55ff55]Level: {enemy["level"]}[/color]'
-            ) 
-        app_instance.update_result('[color=cccccc]================[/color]') 
-
-        app_instance.update_result('[color=cccccc]Analyzing players... Waiting 10s[/color]') 
-        sleep(10)
-
-        for enemy in enemies:
-            if not app_instance.is_running:
-                break
-            attacked[enemy['id']] = 0
-            app_instance.update_result(
-                f'[color=55ff55]Attacking player ID: {enemy["id"]}...[/color] '
-                f'[color=55ff55]Level: {enemy["level"]}[/color]'
-            ) 
-
-            for i in range(attacks_per_player):
-                if not app_instance.is_running:
-                    break
-                try:
-                    q_response = battle(session, enemy['id'], q, [cards[0]], app_instance)
-                    if q_response.get('data', {}).get('xp_added', 0) > 0:
-                        xp += q_response["data"]["xp_added"]
-                        win += 1
-                    else:
-                        lost += 1
-                        break
-
-                    doon = q_response.get('data', {}).get('weekly_score', 0)
-                    if 'data' in q_response and 'q' in q_response['data']:
-                        q = q_response['data']['q']
-                    attacked[enemy['id']] += 1
-                    app_instance.update_result(
-                        f'[color=55ff55]ID: {enemy["id"]}[/color] | '
-                        f'[color=00ccff]Win: {win}[/color] | '
-                        f'[color=ff5555]Lose: {lost}[/color] | '
-                        f'[color=ffaa00]Doon: {doon}[/color] | '
-                        f'[color=55ff55]XP: {xp}[/color]'
-                    ) 
-
-                    attack_count += 1
-                    sleep(speed)
-                except (KeyError, JSONDecodeError):
-                    app_instance.update_result('[color=ff5555]Error encountered. Retrying...[/color]')
-                    sleep(2)
-                except Exception as e:
-                    app_instance.update_result(f'[color=ff5555]Unexpected error: {e}[/color]')
-                    return
-
-                if cards:
-                    cards.append(cards[0])
-                    cards.pop(0)
-
-            app_instance.update_result(f'[color=cccccc]Finished attacking ID: {enemy["id"]}... Waiting {request_speed}s[/color]') 
-            sleep(request_speed)
-
-            if attack_count >= rest_after_attacks:
-                app_instance.update_result(f'[color=ffaa00]Resting for {rest_duration}s after {attack_count} attacks[/color]')
-                sleep(rest_duration)
-                attack_count = 0
+startup.mark('imports')
 
 class SplashScreen(BoxLayout):
     opacity_value = NumericProperty(0)
@@ -291,6 +71,8 @@ class SplashScreen(BoxLayout):
         super().__init__(**kwargs)
         self.switch_page = switch_page_callback
         self.orientation = 'vertical'
+        self.pending = {'animation', 'engine'}
+        self.left = False
 
         with self.canvas.before:
             Color(0.05, 0.05, 0.15, 1) 
@@ -314,20 +96,91 @@ class SplashScreen(BoxLayout):
         self.rect.size = self.size
 
     def start_animation(self):
-        anim = Animation(opacity=1, duration=2, t='out_elastic') + Animation(font_size=dp(60), duration=2, t='out_elastic')
-        anim.bind(on_complete=lambda *args: Clock.schedule_once(self.go_to_main, 1))
+        anim = Animation(opacity=1, font_size=dp(60), duration=splash_duration, t='out_quad')
+        anim.bind(on_complete=lambda *args: self.finish('animation'))
         anim.start(self.label)
 
+    def engine_loaded(self, error=None):
+        # Page1 shows the error, if any.
+        self.finish('engine')
+
+    def finish(self, step):
+        # Stays only as long as the engine takes to load, or the fade if
+        # that is longer. A tap skips it.
+        self.pending.discard(step)
+        if not self.pending:
+            self.go_to_main(0)
+
+    def on_touch_down(self, touch):
+        self.go_to_main(0)
+        return True
+
     def go_to_main(self, dt):
-        self.switch_page('page1')
+        if not self.left:
+            self.left = True
+            self.switch_page('page1')
+
+class AccountForm(GridLayout):
+    # One labelled TextInput per profile field, built from profile_fields so
+    # every screen that edits an account uses the same widgets and checks.
+    def __init__(self, profile=None, **kwargs):
+        super().__init__(cols=1, size_hint_y=None, padding=dp(10), spacing=dp(5), **kwargs)
+        self.bind(minimum_height=self.setter('height'))
+        self.inputs = {}
+        profile = profile or {}
+
+        for field, label, kind in profile_fields:
+            row = BoxLayout(size_hint_y=None, height=dp(50), spacing=dp(10))
+            row.add_widget(Label(
+                text=label,
+                font_size=dp(16),
+                color=(0.9, 0.9, 1, 1),
+                size_hint=(0.45, 1)
+            ))
+            input_widget = TextInput(
+                text=str(profile.get(field, '')),
+                hint_text=label,
+                multiline=False,
+                background_color=(0.2, 0.4, 0.6, 1),
+                foreground_color=(1, 1, 1, 1),
+                size_hint=(0.55, 1),
+                font_size=dp(16),
+                padding=[dp(10), dp(10), dp(10), dp(10)]
+            )
+            input_widget.bind(text=lambda instance, value, k=kind, l=label: self.validate_field(instance, value, k, l))
+            row.add_widget(input_widget)
+            self.add_widget(row)
+            self.inputs[field] = input_widget
+
+    def validate_field(self, instance, value, kind, label):
+        if not valid_field(kind, value.strip()):
+            instance.background_color = (1, 0, 0, 0.5)
+            instance.hint_text = "Please enter Yes or No" if kind == 'bool' else "Please enter a number"
+        else:
+            instance.background_color = (0.2, 0.4, 0.6, 1)
+            instance.hint_text = label
+
+    def is_valid(self):
+        valid = True
+        for field, label, kind in profile_fields:
+            widget = self.inputs[field]
+            if not valid_field(kind, widget.text.strip()) or (field == 'restore_key' and not widget.text.strip()):
+                widget.background_color = (1, 0, 0, 0.5)
+                valid = False
+        return valid
+
+    def values(self):
+        return {field: widget.text.strip() for field, widget in self.inputs.items()}
 
 class Page1(BoxLayout):
-    def __init__(self, switch_page_callback, **kwargs):
+    def __init__(self, switch_page_callback, store, engine_error=None, **kwargs):
         super().__init__(**kwargs)
         self.orientation = 'vertical'
         self.padding = dp(20)
         self.spacing = dp(15)
         self.switch_page = switch_page_callback
+        self.store = store
+        self.engine_error = None
 
         with self.canvas.before:
             Color(0.05, 0.05, 0.15, 1) 
@@ -339,342 +192,695 @@ class Page1(BoxLayout):
             text="[b]Welcome to DARCOB Script[/b]",
             font_size=dp(35),
             markup=True,
-            color=(0, 0.8, 1, 1) 
+            color=(0, 0.8, 1, 1),
+            size_hint=(1, None),
+            height=dp(80)
         )
         self.add_widget(title)
 
     
-        account_layout = BoxLayout(size_hint=(1, None), height=dp(60))
-        account_label = Label(
-            text="Number of Accounts:",
+        self.profile_list = GridLayout(cols=1, size_hint_y=None, spacing=dp(5))
+        self.profile_list.bind(minimum_height=self.profile_list.setter('height'))
+        scroll_view = ScrollView(size_hint=(1, 1), do_scroll_x=False, do_scroll_y=True)
+        scroll_view.add_widget(self.profile_list)
+        self.add_widget(scroll_view)
+
+    
+        buttons = BoxLayout(size_hint=(1, None), height=dp(60), spacing=dp(10))
+        self.new_button = Button(
+            text="New Account",
             font_size=dp(20),
-            color=(0.9, 0.9, 1, 1) 
-        )
-        self.account_spinner = Spinner(
-            text="1",
-            values=["1", "2", "3"],
-            size_hint=(0.3, 1),
-            background_color=(0, 0.6, 0.8, 1), 
+            size_hint=(0.4, 1),
             background_normal='',
-            color=(1, 1, 1, 1)
+            background_color=(0, 0.6, 0.8, 1)
         )
-        account_layout.add_widget(account_label)
-        account_layout.add_widget(self.account_spinner)
-        self.add_widget(account_layout)
+        self.new_button.bind(on_press=lambda instance: self.switch_page('page2'))
+        buttons.add_widget(self.new_button)
 
-    
-        self.next_button = Button(
-            text="Next ->",
+        self.start_button = Button(
             font_size=dp(20),
-            size_hint=(1, None),
-            height=dp(60),
+            size_hint=(0.6, 1),
             background_normal='',
-            background_color=(0, 0.6, 0.8, 1)
+            background_color=(0, 1, 0.4, 1)
         )
-        self.next_button.bind(on_press=self.go_to_page2)
-        self.add_widget(self.next_button)
+        self.start_button.bind(on_press=self.start_attack)
+        buttons.add_widget(self.start_button)
+        self.add_widget(buttons)
+
+        self.show_profiles()
+        if engine_error is not None:
+            self.engine_loaded(engine_error)
 
     def update_rect(self, *args):
         self.rect.pos = self.pos
         self.rect.size = self.size
 
-    def go_to_page2(self, instance):
-        self.switch_page('page2', num_accounts=int(self.account_spinner.text))
+    def engine_loaded(self, error=None):
+        # Without the engine nothing can be started; profiles stay editable.
+        if error is None or self.engine_error is not None:
+            return
+        self.engine_error = error
+        self.add_widget(Label(
+            text=f'[color=ff5555]Could not load the engine: {error}[/color]',
+            font_size=dp(16),
+            markup=True,
+            size_hint=(1, None),
+            height=dp(60)
+        ), index=len(self.children) - 1)
+        self.update_start_button()
+
+    def show_profiles(self):
+        self.profile_list.clear_widgets()
+        if not self.store.profiles:
+            self.profile_list.add_widget(Label(
+                text="No saved accounts yet, add one with New Account",
+                font_size=dp(18),
+                color=(0.9, 0.9, 1, 1),
+                size_hint_y=None,
+                height=dp(60)
+            ))
+
+        for i, profile in enumerate(self.store.profiles):
+            row = BoxLayout(size_hint_y=None, height=dp(60), spacing=dp(10))
+            toggle = ToggleButton(
+                text=f"{profile_name(profile, i)}   Power {profile.get('power') or '-'}",
+                font_size=dp(18),
+                state='down' if profile.get('selected', True) else 'normal',
+                background_normal='',
+                background_down='',
+                background_color=(0, 0.6, 0.8, 1) if profile.get('selected', True) else (0.2, 0.2, 0.3, 1)
+            )
+            toggle.bind(state=lambda instance, value, index=i: self.select_profile(instance, index, value == 'down'))
+            row.add_widget(toggle)
+
+            edit_button = Button(
+                text="Edit",
+                font_size=dp(18),
+                size_hint=(0.25, 1),
+                background_normal='',
+                background_color=(0.2, 0.4, 0.6, 1)
+            )
+            edit_button.bind(on_press=lambda instance, index=i: self.switch_page('page2', index=index))
+            row.add_widget(edit_button)
+            self.profile_list.add_widget(row)
+        self.update_start_button()
+
+    def select_profile(self, instance, index, selected):
+        self.store.select(index, selected)
+        instance.background_color = (0, 0.6, 0.8, 1) if selected else (0.2, 0.2, 0.3, 1)
+        self.update_start_button()
+
+    def update_start_button(self):
+        count = len(self.store.selected())
+        self.start_button.text = f"Start {count} Account{'s' if count != 1 else ''}"
+        self.start_button.disabled = not count or self.engine_error is not None
+
+    def start_attack(self, instance):
+        self.switch_page('page3', configs=[account_config(profile) for profile in self.store.selected()])
 
 class Page2(BoxLayout):
-    def __init__(self, switch_page_callback, num_accounts, **kwargs):
+    def __init__(self, switch_page_callback, store, index=None, **kwargs):
         super().__init__(**kwargs)
         self.orientation = 'vertical'
         self.padding = dp(20)
         self.spacing = dp(10)
         self.switch_page = switch_page_callback
-        self.num_accounts = num_accounts
-        self.current_account = 0
-        self.account_inputs = []
+        self.store = store
+        self.index = index
+        profile = store.profiles[index] if index is not None else {'name': f'Account {len(store.profiles) + 1}'}
 
         with self.canvas.before:
             Color(0.05, 0.05, 0.15, 1) 
             self.rect = Rectangle(pos=self.pos, size=self.size)
             self.bind(pos=self.update_rect, size=self.update_rect)
 
-    
-        self.input_panel = GridLayout(cols=1, size_hint_y=None, padding=dp(10), spacing=dp(5))
-        self.input_panel.bind(minimum_height=self.input_panel.setter('height'))
+        self.add_widget(Label(
+            text=f"[b]{'Edit' if index is not None else 'New'} Account[/b]",
+            font_size=dp(24),
+            color=(1, 1, 1, 1), 
+            markup=True,
+            size_hint_y=None,
+            height=dp(40)
+        ))
 
     
+        self.form = AccountForm(profile)
         scroll_view = ScrollView(size_hint=(1, 0.75), do_scroll_x=False, do_scroll_y=True)
-        scroll_view.add_widget(self.input_panel)
+        scroll_view.add_widget(self.form)
         self.add_widget(scroll_view)
 
     
-        self.next_button = Button(
-            text="Next ->",
+        buttons = BoxLayout(size_hint=(1, None), height=dp(60), spacing=dp(10))
+        back_button = Button(
+            text="<- Back",
             font_size=dp(20),
-            size_hint=(1, None),
-            height=dp(60),
             background_normal='',
-            background_color=(0, 0.6, 0.8, 1),
-            disabled=True
+            background_color=(0, 0.6, 0.8, 1)
         )
-        self.next_button.bind(on_press=self.next_account)
-        self.add_widget(self.next_button)
-
-
-        self.start_button = Button(
-            text="Start",
+        back_button.bind(on_press=lambda instance: self.switch_page('page1'))
+        buttons.add_widget(back_button)
+
+        if index is not None:
+            delete_button = Button(
+                text="Delete",
+                font_size=dp(20),
+                background_normal='',
+                background_color=(1, 0.4, 0.4, 1)
+            )
+            delete_button.bind(on_press=self.delete_profile)
+            buttons.add_widget(delete_button)
+
+        save_button = Button(
+            text="Save",
             font_size=dp(20),
-            size_hint=(1, None),
-            height=dp(60),
             background_normal='',
-            background_color=(0, 1, 0.4, 1),
-            disabled=True
+            background_color=(0, 1, 0.4, 1)
         )
-        self.start_button.bind(on_press=self.start_attack)
-        self.add_widget(self.start_button)
-
-        self.show_account_inputs()
+        save_button.bind(on_press=self.save_profile)
+        buttons.add_widget(save_button)
+        self.add_widget(buttons)
 
     def update_rect(self, *args):
         self.rect.pos = self.pos
         self.rect.size = self.size
 
-    def validate_input(self, text, field_type):
-        if not text and field_type not in ['power', 'save_to_db']:
-            return True
-        if field_type in ['power', 'min_level', 'min_level_storage', 'attacks_per_player', 'rest_after_attacks', 'rest_duration']:
-            try:
-                int(text)
-                return True
-            except ValueError:
-                return False
-        elif field_type in ['attack_speed', 'request_speed']:
-            try:
-                float(text)
-                return True
-            except ValueError:
-                return False
-        elif field_type == 'save_to_db':
-            return text.lower() in ['yes', 'no']
-        return True
+    def save_profile(self, instance):
+        if not self.form.is_valid():
+            return
+        profile = self.form.values()
+        profile['selected'] = self.store.profiles[self.index].get('selected', True) if self.index is not None else True
+        self.store.put(profile, self.index)
+        self.switch_page('page1')
 
-    def validate_field(self, instance, value, field_type):
-        if not self.validate_input(value, field_type):
-            instance.background_color = (1, 0, 0, 0.5)
-            instance.hint_text = "Please enter a number" if field_type != 'save_to_db' else "Please enter Yes or No"
+    def delete_profile(self, instance):
+        self.store.remove(self.index)
+        self.switch_page('page1')
+
+class LogLine(Label):
+    # Wraps at the view's width and is as tall as its text, so long lines
+    # are shown whole; the RecycleBoxLayout re-lays out rows whose height
+    # changes.
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.markup = True
+        self.font_size = dp(14)
+        self.color = (1, 1, 1, 1)
+        self.halign = 'left'
+        self.valign = 'middle'
+        self.size_hint_y = None
+        self.bind(width=lambda instance, value: setattr(instance, 'text_size', (value, None)))
+        self.bind(texture_size=lambda instance, value: setattr(instance, 'height', max(dp(40), value[1] + dp(8))))
+
+class LogView(RecycleView):
+    # Ring buffer of at most max_lines entries; only visible rows get a widget.
+    # data is edited in place, so the view only refreshes the rows appended
+    # and the ones dropped off the top instead of rebuilding all of them.
+    def __init__(self, max_lines=log_max_lines, **kwargs):
+        super().__init__(**kwargs)
+        self.max_lines = max_lines
+        self.do_scroll_x = False
+        layout = RecycleBoxLayout(
+            orientation='vertical',
+            size_hint_y=None,
+            default_size=(None, dp(40)),
+            default_size_hint=(1, None)
+        )
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+        # viewclass lives on the layout manager, so it is set once there is one.
+        self.viewclass = LogLine
+
+    def append(self, text):
+        self.extend([text])
+
+    def extend(self, lines):
+        follow = self.scroll_y <= 0.01 or self.layout_manager.height <= self.height
+        lines = list(lines)[-self.max_lines:]
+        overflow = len(self.data) + len(lines) - self.max_lines
+        if overflow > 0:
+            del self.data[:overflow]
+        self.data.extend({'text': line} for line in lines)
+        if follow:
+            self.scroll_y = 0
+
+class UIBus:
+    # Worker threads only ever append to the deque; the UI thread drains it
+    # once per frame, so widgets are touched from the main loop alone.
+    # While paused nothing is scheduled: events are folded into the latest
+    # value per account plus the last log_max_lines lines, and handed back
+    # in one batch by resume().
+    def __init__(self, on_push=None, max_lines=log_max_lines):
+        self.events = deque()
+        self.on_push = on_push
+        self.lock = Lock()
+        self.paused = False
+        self.lines = deque(maxlen=max_lines)
+        self.latest = {}
+
+    def push(self, kind, account, value):
+        if self.paused:
+            with self.lock:
+                if self.paused:
+                    self.fold(kind, account, value)
+                    return
+        self.events.append((kind, account, value))
+        if self.on_push:
+            self.on_push()
+
+    def fold(self, kind, account, value):
+        # Each fold key keeps one event: the newest, or for counters the
+        # merge of all of them. Battle events are cumulative per enemy.
+        if kind == 'log':
+            self.lines.append(value)
+        elif kind == 'counters':
+            previous = self.latest.get((kind, account))
+            self.latest[kind, account] = (kind, account, {**(previous[2] if previous else {}), **value})
+        elif kind == 'enemy':
+            self.latest[kind, account, value[0]] = (kind, account, value)
         else:
-            instance.background_color = (0.2, 0.4, 0.6, 1)
-            instance.hint_text = f"Power {self.current_account + 1}" if field_type == 'power' else instance.hint_text
+            self.latest[kind, account] = (kind, account, value)
+
+    def pause(self):
+        with self.lock:
+            self.paused = True
+            while self.events:
+                self.fold(*self.events.popleft())
+
+    def resume(self):
+        with self.lock:
+            self.paused = False
+            events = [('log', None, line) for line in self.lines]
+            events += list(self.latest.values())
+            self.lines.clear()
+            self.latest = {}
+        return events
+
+    def drain(self, limit=ui_batch_limit):
+        events = []
+        while self.events and len(events) < limit:
+            events.append(self.events.popleft())
+        return events
+
+class AccountChannel(Reporter):
+    def __init__(self, page, account, stop_event=None):
+        super().__init__(account, stop_event)
+        self.page = page
 
-    def show_account_inputs(self):
-        self.input_panel.clear_widgets()
-        print(f"Adding inputs for Account {self.current_account + 1}") 
+    def update_result(self, text):
+        self.page.bus.push('log', self.account, f'[color=888888]#{self.account}[/color] {text}')
 
+    def update_progress(self, value):
+        self.page.bus.push('progress', self.account, value)
 
-        self.input_panel.add_widget(Label(
-            text=f"[b]Account {self.current_account + 1}[/b]",
-            font_size=dp(24),
-            color=(1, 1, 1, 1), 
+    def update_counters(self, **counters):
+        self.page.bus.push('counters', self.account, counters)
+
+    def update_status(self, text):
+        self.page.bus.push('status', self.account, text)
+
+    def update_enemies(self, enemies):
+        self.page.bus.push('enemies', self.account, enemies)
+
+    def update_enemy(self, enemy_id, battles, result):
+        self.page.bus.push('enemy', self.account, (enemy_id, battles, result))
+
+class AccountProgress(BoxLayout):
+    def __init__(self, account, **kwargs):
+        super().__init__(**kwargs)
+        self.orientation = 'vertical'
+        self.size_hint_y = None
+        self.height = dp(44)
+        self.account = account
+        self.status = 'Waiting'
+        self.counters = {}
+
+        self.label = Label(
+            text=f'[b]Account {account}[/b] | {self.status}',
+            font_size=dp(14),
+            color=(0.9, 0.9, 1, 1),
             markup=True,
             size_hint_y=None,
-            height=dp(40)
-        ))
+            height=dp(24)
+        )
+        self.add_widget(self.label)
+
+        self.progress_bar = ProgressBar(max=100, value=0, size_hint=(1, None), height=dp(20))
+        self.add_widget(self.progress_bar)
+
+    def update_status(self, status):
+        self.status = status
+        self.refresh()
+
+    def update_counters(self, counters):
+        self.counters.update(counters)
+        self.refresh()
+
+    def refresh(self):
+        self.label.text = (
+            f'[b]Account {self.account}[/b] | {self.status} | '
+            f'[color=00ccff]Win: {self.counters.get("win", 0)}[/color] | '
+            f'[color=ff5555]Lose: {self.counters.get("lost", 0)}[/color] | '
+            f'[color=ffaa00]Doon: {self.counters.get("doon", 0)}[/color] | '
+            f'[color=55ff55]XP: {self.counters.get("xp", 0)}[/color] | '
+            f'[color=cccccc]Retries: {self.counters.get("retries", 0)}[/color]'
+        )
+
+def format_stats(account, stats):
+    latency = ' '.join(
+        f'{endpoint.split("/")[-1]} {values["p50"] * 1000:.0f}/{values["p99"] * 1000:.0f}ms'
+        for endpoint, values in sorted(stats['latency'].items())
+    )
+    sleeps = ' '.join(f'{kind} {seconds:.0f}s' for kind, seconds in sorted(stats['sleep'].items()))
+    return (
+        f'[b]#{account}[/b] Battles: {stats["battles"]} '
+        f'([color=00ccff]{stats["wins"]}W[/color]/[color=ff5555]{stats["losses"]}L[/color]) | '
+        f'[color=55ff55]XP/h: {stats["xp_per_hour"]:.0f}[/color] | '
+        f'[color=ffaa00]Retries: {stats["retries"]} 429: {stats["throttled"]} Errors: {stats["errors"]}[/color]\n'
+        f'[color=cccccc]p50/p99 {latency or "-"} | Sleep {sleeps or "-"}[/color]'
+    )
+
+class StatsPanel(Label):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.markup = True
+        self.font_size = dp(12)
+        self.color = (0.9, 0.9, 1, 1)
+        self.halign = 'left'
+        self.valign = 'top'
+        self.size_hint_y = None
+        self.bind(width=lambda instance, value: setattr(instance, 'text_size', (value, None)))
+        self.bind(texture_size=lambda instance, value: setattr(instance, 'height', value[1]))
 
-        inputs = {
-            'restore_key': TextInput(hint_text=f"Restore Key {self.current_account + 1}", multiline=False, background_color=(0.2, 0.4, 0.6, 1), foreground_color=(1, 1, 1, 1), size_hint_y=None, height=dp(50), font_size=dp(16), padding=[dp(10), dp(10), dp(10), dp(10)]),
-            'power': TextInput(hint_text=f"Power {self.current_account + 1}", multiline=False, background_color=(0.2, 0.4, 0.6, 1), foreground_color=(1, 1, 1, 1), size_hint_y=None, height=dp(50), font_size=dp(16), padding=[dp(10), dp(10), dp(10), dp(10)]),
-            'min_level': TextInput(hint_text="Level Up to Attack", multiline=False, background_color=(0.2, 0.4, 0.6, 1), foreground_color=(1, 1, 1, 1), size_hint_y=None, height=dp(50), font_size=dp(16), padding=[dp(10), dp(10), dp(10), dp(10)]),
-            'min_level_storage': TextInput(hint_text="Level Up to Save Database", multiline=False, background_color=(0.2, 0.4, 0.6, 1), foreground_color=(1, 1, 1, 1), size_hint_y=None, height=dp(50), font_size=dp(16), padding=[dp(10), dp(10), dp(10), dp(10)]),
-            'attacks_per_player': TextInput(hint_text="Number of Attacks to Enemy", multiline=False, background_color=(0.2, 0.4, 0.6, 1), foreground_color=(1, 1, 1, 1), size_hint_y=None, height=dp(50), font_size=dp(16), padding=[dp(10), dp(10), dp(10), dp(10)]),
-            'rest_after_attacks': TextInput(hint_text="Rest After How Many Attacks", multiline=False, background_color=(0.2, 0.4, 0.6, 1), foreground_color=(1, 1, 1, 1), size_hint_y=None, height=dp(50), font_size=dp(16), padding=[dp(10), dp(10), dp(10), dp(10)]),
-            'rest_duration': TextInput(hint_text="Rest Duration (seconds)", multiline=False, background_color=(0.2, 0.4, 0.6, 1), foreground_color=(1, 1, 1, 1), size_hint_y=None, height=dp(50), font_size=dp(16), padding=[dp(10), dp(10), dp(10), dp(10)]),
-            'attack_speed': TextInput(hint_text="Attack Speed (seconds)", multiline=False, background_color=(0.2, 0.4, 0.6, 1), foreground_color=(1, 1, 1, 1), size_hint_y=None, height=dp(50), font_size=dp(16), padding=[dp(10), dp(10), dp(10), dp(10)]),
-            'request_speed': TextInput(hint_text="Request Speed (seconds)", multiline=False, background_color=(0.2, 0.4, 0.6, 1), foreground_color=(1, 1, 1, 1), size_hint_y=None, height=dp(50), font_size=dp(16), padding=[dp(10), dp(10), dp(10), dp(10)]),
-            'save_to_db': TextInput(hint_text="Save to DB (Yes/No)", multiline=False, background_color=(0.2, 0.4, 0.6, 1), foreground_color=(1, 1, 1, 1), size_hint_y=None, height=dp(50), font_size=dp(16), padding=[dp(10), dp(10), dp(10), dp(10)])
-        }
-
-        for field, input_widget in inputs.items():
-            print(f"Adding {field} input") 
-            self.input_panel.add_widget(input_widget)
-            if field != 'restore_key':
-                input_widget.bind(text=lambda instance, value, f=field: self.validate_field(instance, value, f))
-
-        self.account_inputs.append(inputs)
-        self.next_button.disabled = self.current_account == self.num_accounts - 1
-        self.start_button.disabled = self.current_account < self.num_accounts - 1
-
-    def next_account(self, instance):
-        if self.current_account < self.num_accounts - 1:
-            self.current_account += 1
-            self.show_account_inputs()
-            if self.current_account == self.num_accounts - 1:
-                self.next_button.text = "Finish"
+    def refresh(self, dt=None):
+        self.text = '\n'.join(format_stats(account, registry.account_stats(account)) for account in registry.accounts())
+
+enemy_columns = (('id', 'ID'), ('power', 'Power'), ('level', 'Level'), ('league', 'League'), ('attacks', 'Attacks'), ('result', 'Last'))
+result_colors = {'won': '55ff55', 'lost': 'ff5555', 'failed': 'ffaa00'}
+
+class EnemyRow(BoxLayout):
+    # RecycleView row; data items are {'cells': (...)} in enemy_columns order.
+    cells = ListProperty()
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.labels = [Label(font_size=dp(14), markup=True, color=(1, 1, 1, 1)) for _ in enemy_columns]
+        for label in self.labels:
+            self.add_widget(label)
+
+    def on_cells(self, instance, cells):
+        for label, text in zip(self.labels, cells):
+            label.text = text
+
+class EnemyTable(BoxLayout):
+    # Every enemy the workers reported, keyed by id. A new round merges its
+    # list and re-renders once; a battle only rewrites its own row, unless
+    # the table is sorted or filtered on a column that battle changed.
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.orientation = 'vertical'
+        self.spacing = dp(5)
+        self.rows = {}
+        self.positions = {}
+        self.sort_key = 'power'
+        self.descending = False
+        self.render_trigger = Clock.create_trigger(self.render, 0.5)
+
+        controls = BoxLayout(size_hint=(1, None), height=dp(40), spacing=dp(10))
+        self.filter_input = TextInput(
+            hint_text="Filter by ID or result",
+            multiline=False,
+            background_color=(0.2, 0.4, 0.6, 1),
+            foreground_color=(1, 1, 1, 1),
+            font_size=dp(14),
+            size_hint=(0.7, 1)
+        )
+        self.filter_input.bind(text=lambda instance, value: self.render_trigger())
+        controls.add_widget(self.filter_input)
+        self.count_label = Label(font_size=dp(14), color=(0.9, 0.9, 1, 1), size_hint=(0.3, 1))
+        controls.add_widget(self.count_label)
+        self.add_widget(controls)
+
+        header = BoxLayout(size_hint=(1, None), height=dp(36))
+        self.header_buttons = {}
+        for key, title in enemy_columns:
+            button = Button(
+                text=title,
+                font_size=dp(14),
+                background_normal='',
+                background_color=(0, 0.6, 0.8, 1)
+            )
+            button.bind(on_press=lambda instance, k=key: self.sort_by(k))
+            header.add_widget(button)
+            self.header_buttons[key] = button
+        self.add_widget(header)
+
+        self.view = RecycleView(do_scroll_x=False)
+        layout = RecycleBoxLayout(
+            orientation='vertical',
+            size_hint_y=None,
+            default_size=(None, dp(32)),
+            default_size_hint=(1, None)
+        )
+        layout.bind(minimum_height=layout.setter('height'))
+        self.view.add_widget(layout)
+        self.view.viewclass = EnemyRow
+        self.add_widget(self.view)
+        self.update_header()
+
+    def set_enemies(self, account, enemies):
+        for enemy in enemies:
+            row = self.rows.get(enemy.id)
+            if row is None:
+                self.rows[enemy.id] = {**enemy._asdict(), 'attacks': 0, 'result': '', 'battles': {}}
+            else:
+                row.update(enemy._asdict())
+        self.render_trigger()
+
+    def update_enemy(self, account, enemy_id, battles, result):
+        row = self.rows.get(enemy_id)
+        if row is None:
+            row = self.rows[enemy_id] = {'id': enemy_id, 'power': None, 'level': None, 'league': None,
+                                         'attacks': 0, 'result': '', 'battles': {}}
+        row['battles'][account] = battles
+        row['attacks'] = sum(row['battles'].values())
+        row['result'] = result
+        position = self.positions.get(enemy_id)
+        if position is None or self.filter_input.text or self.sort_key in ('attacks', 'result'):
+            self.render_trigger()
         else:
-            self.next_button.disabled = True
-            self.start_button.disabled = False
-            self.next_button.opacity = 0
+            self.view.data[position] = {'cells': self.cells(row)}
+
+    def cells(self, row):
+        result = row['result']
+        return (
+            row['id'],
+            '' if row['power'] is None else str(row['power']),
+            '' if row['level'] is None else str(row['level']),
+            '' if row['league'] is None else str(row['league']),
+            str(row['attacks']),
+            f'[color={result_colors[result]}]{result}[/color]' if result in result_colors else result,
+        )
 
-    def start_attack(self, instance):
-        self.switch_page('page3', account_inputs=self.account_inputs)
+    def sort_by(self, key):
+        self.descending = not self.descending if key == self.sort_key else False
+        self.sort_key = key
+        self.update_header()
+        self.render()
+
+    def update_header(self):
+        for key, title in enemy_columns:
+            arrow = (' v' if self.descending else ' ^') if key == self.sort_key else ''
+            self.header_buttons[key].text = title + arrow
+
+    def render(self, dt=None):
+        text = self.filter_input.text.strip().lower()
+        rows = [row for row in self.rows.values() if not text or text in f'{row["id"]} {row["result"]}'.lower()]
+        key = self.sort_key
+        # Rows seen only through a battle event have no power or level yet;
+        # they go last either way.
+        missing = [row for row in rows if row[key] is None]
+        rows = sorted((row for row in rows if row[key] is not None),
+                      key=lambda row: row[key],
+                      reverse=self.descending) + missing
+        self.positions = {row['id']: i for i, row in enumerate(rows)}
+        self.view.data = [{'cells': self.cells(row)} for row in rows]
+        self.count_label.text = f'{len(rows)} / {len(self.rows)} enemies'
 
 class Page3(BoxLayout):
-    result_text = StringProperty("")
-    progress_value = NumericProperty(0)
-
-    def __init__(self, switch_page_callback, account_inputs, **kwargs):
+    def __init__(self, switch_page_callback, configs, log_max_lines=log_max_lines, **kwargs):
         super().__init__(**kwargs)
         self.orientation = 'vertical'
         self.padding = dp(20)
         self.spacing = dp(10)
         self.switch_page = switch_page_callback
-        self.account_inputs = account_inputs
-        self.threads = []
-        self.conns = []
-        self.is_running = True
+        self.configs = configs
+        self.engine = None
+        self.account_rows = {}
+        self.flush_trigger = Clock.create_trigger(self.flush_events)
+        self.bus = UIBus(on_push=self.flush_trigger, max_lines=log_max_lines)
+        self.last_event = monotonic()
+        self.idle = False
 
         with self.canvas.before:
             Color(0.05, 0.05, 0.15, 1)
             self.rect = Rectangle(pos=self.pos, size=self.size)
             self.bind(pos=self.update_rect, size=self.update_rect)
 
-        self.progress_bar = ProgressBar(max=100, value=0, size_hint=(1, None), height=dp(20))
-        self.bind(progress_value=self.progress_bar.setter('value'))
-        self.add_widget(self.progress_bar)
-
-        self.result_label = Label(
-            text='',
-            font_size=dp(16),
-            color=(1, 1, 1, 1),
-            size_hint_y=None,
-            markup=True
+        self.progress_panel = BoxLayout(orientation='vertical', size_hint_y=None, height=0, spacing=dp(5))
+        self.progress_panel.bind(minimum_height=self.progress_panel.setter('height'))
+        self.add_widget(self.progress_panel)
+
+        self.stats_panel = StatsPanel()
+        self.add_widget(self.stats_panel)
+
+        tabs = TabbedPanel(do_default_tab=False, size_hint=(1, 0.75), tab_width=dp(120))
+        log_tab = TabbedPanelItem(text='Log')
+        self.log_view = LogView(max_lines=log_max_lines)
+        log_tab.add_widget(self.log_view)
+        tabs.add_widget(log_tab)
+        enemies_tab = TabbedPanelItem(text='Enemies')
+        self.enemy_table = EnemyTable()
+        enemies_tab.add_widget(self.enemy_table)
+        tabs.add_widget(enemies_tab)
+        tabs.default_tab = log_tab
+        self.add_widget(tabs)
+
+        buttons = BoxLayout(size_hint=(1, None), height=dp(60), spacing=dp(10))
+        self.export_button = Button(
+            text="Export Stats",
+            font_size=dp(20),
+            size_hint=(0.4, 1),
+            background_normal='',
+            background_color=(0, 0.6, 0.8, 1)
         )
-        self.result_label.bind(width=lambda instance, value: setattr(instance, 'text_size', (value, None)))
-        self.result_label.bind(texture_size=lambda instance, value: setattr(instance, 'height', value[1]))
-        self.bind(result_text=self.result_label.setter('text'))
-
-        scroll_view = ScrollView(size_hint=(1, 0.75), do_scroll_x=False, do_scroll_y=True)
-        scroll_view.add_widget(self.result_label)
-        self.add_widget(scroll_view)
+        self.export_button.bind(on_press=self.export_stats)
+        buttons.add_widget(self.export_button)
 
         self.stop_button = Button(
             text="Stop",
             font_size=dp(20),
-            size_hint=(1, None),
-            height=dp(60),
+            size_hint=(0.6, 1),
             background_normal='',
             background_color=(1, 0.4, 0.4, 1)
         )
         self.stop_button.bind(on_press=self.stop_attack)
-        self.add_widget(self.stop_button)
+        buttons.add_widget(self.stop_button)
+        self.add_widget(buttons)
 
         self.start_threads()
+        self.stats_event = Clock.schedule_interval(self.tick, stats_interval)
 
     def update_rect(self, *args):
         self.rect.pos = self.pos
         self.rect.size = self.size
 
     def update_result(self, text):
-        Clock.schedule_once(lambda dt: setattr(self, 'result_text', self.result_text + "\n" + text))
-
-    def update_progress(self, value):
-        self.progress_value = value
+        self.bus.push('log', None, text)
+
+    def account_row(self, account):
+        if account not in self.account_rows:
+            row = AccountProgress(account)
+            self.account_rows[account] = row
+            self.progress_panel.add_widget(row)
+        return self.account_rows[account]
+
+    def schedule_stats(self, interval):
+        self.stats_event.cancel()
+        self.stats_event = Clock.schedule_interval(self.tick, interval)
+
+    def tick(self, dt):
+        self.stats_panel.refresh()
+        # Nothing but sleeps pending: refresh (and redraw) the stats less
+        # often until the next event or touch.
+        if not self.idle and monotonic() - self.last_event > idle_after:
+            self.idle = True
+            self.schedule_stats(idle_stats_interval)
+
+    def wake(self):
+        self.last_event = monotonic()
+        if self.idle and not self.bus.paused:
+            self.idle = False
+            self.schedule_stats(stats_interval)
+
+    def on_touch_down(self, touch):
+        self.wake()
+        return super().on_touch_down(touch)
+
+    def pause(self):
+        # Workers keep running; only the view stops updating.
+        self.bus.pause()
+        self.stats_event.cancel()
+        self.idle = True
+
+    def resume(self):
+        self.apply_events(self.bus.resume())
+        self.tick(0)
+        self.wake()
+
+    def flush_events(self, dt):
+        self.apply_events(self.bus.drain())
+        if self.bus.events:
+            self.flush_trigger()
+
+    def apply_events(self, events):
+        if events:
+            self.wake()
+        lines = []
+        progress = {}
+        counters = {}
+        status = {}
+        for kind, account, value in events:
+            if kind == 'log':
+                lines.append(value)
+            elif kind == 'progress':
+                progress[account] = value
+            elif kind == 'status':
+                status[account] = value
+            elif kind == 'counters':
+                counters.setdefault(account, {}).update(value)
+            elif kind == 'enemies':
+                self.enemy_table.set_enemies(account, value)
+            elif kind == 'enemy':
+                self.enemy_table.update_enemy(account, *value)
+
+        if lines:
+            self.log_view.extend(lines)
+        for account, value in progress.items():
+            self.account_row(account).progress_bar.value = value
+        for account, values in counters.items():
+            self.account_row(account).update_counters(values)
+        for account, value in status.items():
+            self.account_row(account).update_status(value)
 
     def start_threads(self):
         self.update_result('[color=55ff55]Welcome to the Game Automation Script![/color]')
         self.update_result('[color=cccccc]================[/color]')
-        num_accounts = len(self.account_inputs)
-        sessions = []
-        load_data = []
-        invalid_accounts = []
-
-        for i in range(num_accounts):
-            account = self.account_inputs[i]
-            restore_key = account['restore_key'].text
-            if not restore_key:
-                invalid_accounts.append(i + 1)
-                self.update_result(f'[color=ff5555]Error: Account {i + 1} is invalid (no restore key)![/color]')
-                continue
-
-            session = create_session()
-            load_result = load(session, restore_key, self)
-            if not load_result.get('status', False):
-                invalid_accounts.append(i + 1)
-                self.update_result(f'[color=ff5555]Connection failed for Account {i + 1}![/color]')
-                continue
-
-            account_info = load_result['data']
-            tribe_name = account_info['tribe']['name']
-            self.update_result(f'[color=55ff55]Connection successful for Account {i + 1}![/color]')
-            self.update_result(
-                f'[color=cccccc]Account Name: {account_info["name"]}[/color] | '
-                f'[color=55ff55]Level: {account_info["level"]}[/color] | '
-                f'[color=ffaa00]Gold: {account_info["gold"]}[/color] | '
-                f'[color=00ccff]Tribe: {tribe_name}[/color]'
-            )  # ترکیب رنگ‌ها
-            self.update_result('[color=cccccc]================[/color]')
-
-            sessions.append(session)
-            load_data.append({
-                'data': load_result,
-                'power': int(account['power'].text) if account['power'].text else 0,
-                'min_level': int(account['min_level'].text) if account['min_level'].text else 8,
-                'min_level_storage': int(account['min_level_storage'].text) if account['min_level_storage'].text else 8,
-                'attacks_per_player': int(account['attacks_per_player'].text) if account['attacks_per_player'].text else 1,
-                'rest_after_attacks': int(account['rest_after_attacks'].text) if account['rest_after_attacks'].text else 10,
-                'rest_duration': int(account['rest_duration'].text) if account['rest_duration'].text else 60,
-                'attack_speed': float(account['attack_speed'].text) if account['attack_speed'].text else 1.0,
-                'request_speed': float(account['request_speed'].text) if account['request_speed'].text else 1.0,
-                'save_to_db': account['save_to_db'].text.lower() == 'yes'
-            })
-
-        if invalid_accounts:
-            self.update_result(f'[color=ff5555]Error: Accounts {", ".join(map(str, invalid_accounts))} are invalid![/color]')
-            self.is_running = False
-            return
 
-        account_info = [data['data']['data'] for data in load_data]
-        cards = [[i['id'] for i in info['cards'] if i['power'] < 100] for info in account_info]
-
-        if any(len(card) < 20 for card in cards):
-            self.update_result('[color=ff5555]One or more accounts have less than 20 cards![/color]')
-            self.is_running = False
-            return
+        for i, config in enumerate(self.configs):
+            if config['restore_key']:
+                self.account_row(i + 1)
+        # Usually already imported by DarCobApp.preload_engine.
+        from engine import Engine
+        self.engine = Engine(log=self.update_result).start(
+            self.configs, lambda account, stop_event: AccountChannel(self, account, stop_event))
 
-        players = [fetch_players_from_server(sessions[i], load_data[i]['min_level'], self) for i in range(len(load_data))]
-        if not all(players[i] for i in range(len(load_data))):
-            self.update_result('[color=ff5555]No players fetched from server for one or more accounts![/color]')
-            self.is_running = False
+    def export_stats(self, instance):
+        try:
+            paths = [registry.write(f'{stats_export_path}.json'), registry.write(f'{stats_export_path}.prom')]
+        except OSError as e:
+            self.update_result(f'[color=ff5555]Could not export stats: {e}[/color]')
             return
-
-        league_ids = [players[i][0]['league_id'] for i in range(len(load_data))]
-        db_files = [f'Leage_{league_ids[i]}_Account{i+1}.db' for i in range(len(load_data))]
-
-        for i in range(len(load_data)):
-            conn, cursor = create_or_open_db(db_files[i])
-            self.conns.append(conn)
-            self.update_result(f'[color=cccccc]Using database file \'{db_files[i]}\' for Account {i+1}[/color]')
-            if load_data[i]['save_to_db']:
-                update_players_in_db(cursor, players[i], load_data[i]['min_level_storage'])
-                conn.commit()
-                self.update_result(f'[color=55ff55]{len(players[i])} players fetched and stored in database for Account {i+1}[/color]')
-
-            thread = threading.Thread(target=attack_offline, args=(
-                sessions[i], cursor, db_files[i],
-                load_data[i]['power'], load_data[i]['min_level'], cards[i],
-                load_data[i]['attacks_per_player'], load_data[i],
-                load_data[i]['rest_after_attacks'], load_data[i]['rest_duration'],
-                load_data[i]['attack_speed'], load_data[i]['request_speed'],
-                load_data[i]['save_to_db'], self
-            ))
-            self.threads.append(thread)
-            thread.start()
+        self.update_result(f'[color=55ff55]Stats written to {", ".join(paths)}[/color]')
 
     def stop_attack(self, instance):
-        self.is_running = False
+        self.stats_event.cancel()
+        # Late events from the winding-down workers must not restart it.
+        self.idle = False
         self.update_result('[color=ff5555]Script stopped[/color]')
-        for thread in self.threads:
-            thread.join()
-        for conn in self.conns:
-            conn.close()
+        # cancel() does not wait: the workers wind down and close their
+        # sessions and DB writers in the background.
+        if self.engine:
+            self.engine.cancel()
         self.switch_page('page1')
 
 class DarCobApp(BoxLayout):
@@ -683,23 +889,98 @@ class DarCobApp(BoxLayout):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.orientation = 'vertical'
-        self.switch_page('splash')
+        self.profiles = ProfileStore().load()
+        self.page = None
+        self.paused = False
+        self.engine_ready = False
+        self.engine_error = None
+        self.switch_page('splash' if splash_duration else 'page1')
+        Thread(target=self.preload_engine, daemon=True, name='Preload').start()
+
+    def preload_engine(self):
+        # requests, aiohttp and sqlite3 all come in with engine; importing it
+        # here keeps them off the UI thread and out of the first frame.
+        # A failed import still ends the splash, with the error on Page1.
+        error = None
+        try:
+            import_module('engine')
+        except Exception as e:
+            Logger.exception('DarCob: could not load the engine')
+            error = e
+        startup.mark('engine')
+        Clock.schedule_once(lambda dt: self.engine_loaded(error))
+
+    def engine_loaded(self, error=None):
+        self.engine_ready = error is None
+        self.engine_error = error
+        if hasattr(self.page, 'engine_loaded'):
+            self.page.engine_loaded(error)
+        self.report_startup()
+
+    def report_startup(self):
+        if not startup.mode or not startup.done('page1', 'engine'):
+            return
+        startup.report()
+        if startup.mode == 'exit':
+            App.get_running_app().stop()
+        startup.mode = None
 
     def switch_page(self, page, **kwargs):
         self.clear_widgets()
         self.current_page = page
         if page == 'splash':
-            self.add_widget(SplashScreen(self.switch_page))
+            self.page = SplashScreen(self.switch_page)
         elif page == 'page1':
-            self.add_widget(Page1(self.switch_page))
+            self.page = Page1(self.switch_page, self.profiles, self.engine_error)
         elif page == 'page2':
-            self.add_widget(Page2(self.switch_page, kwargs['num_accounts']))
+            self.page = Page2(self.switch_page, self.profiles, kwargs.get('index'))
         elif page == 'page3':
-            self.add_widget(Page3(self.switch_page, kwargs['account_inputs']))
+            self.page = Page3(self.switch_page, kwargs['configs'])
+        self.add_widget(self.page)
+        if page == 'page1' and 'page1' not in startup.marks:
+            Clock.schedule_once(self.page1_shown)
+
+    def page1_shown(self, dt):
+        startup.mark('page1')
+        self.report_startup()
+
+    def pause(self):
+        self.paused = True
+        if hasattr(self.page, 'pause'):
+            self.page.pause()
+
+    def resume(self):
+        self.paused = False
+        if hasattr(self.page, 'resume'):
+            self.page.resume()
 
 class DarCob(App):
     def build(self):
-        return DarCobApp()
+        Window.bind(on_key_down=self.on_key_down)
+        Window.bind(on_flip=self.first_frame)
+        root = DarCobApp()
+        startup.mark('build')
+        return root
+
+    def first_frame(self, window):
+        startup.mark('first_frame')
+        Window.unbind(on_flip=self.first_frame)
+
+    def on_pause(self):
+        self.root.pause()
+        return True
+
+    def on_resume(self):
+        self.root.resume()
+
+    def on_key_down(self, window, key, *args):
+        if key != pause_key:
+            return False
+        if self.root.paused:
+            self.on_resume()
+        else:
+            self.on_pause()
+        return True
 
 if __name__ == "__main__":
     DarCob().run()
\ No newline at end of file
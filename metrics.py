@@ -0,0 +1,181 @@
+import os
+import json
+import threading
+from bisect import bisect_left
+from time import time, monotonic
+
+latency_buckets = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    # Fixed buckets, Prometheus style: counts[i] holds values <= buckets[i],
+    # the last slot everything above the largest bucket.
+    def __init__(self, buckets=latency_buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket the rank falls into, the same
+        # estimate histogram_quantile() gives.
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for i, n in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else lower
+            if n and cumulative + n >= rank:
+                return lower + (upper - lower) * (rank - cumulative) / n
+            cumulative += n
+            lower = upper
+        return lower
+
+
+class Metrics:
+    # Process-wide counters and histograms keyed by name and labels. Worker
+    # threads and the asyncio loop record into it; the UI and exporters read
+    # snapshots.
+    def __init__(self, prefix='darcob'):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+            self.started = {}
+            self.created = time()
+
+    def start(self, account):
+        with self.lock:
+            self.started.setdefault(account, monotonic())
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def select(self, table, name, labels):
+        with self.lock:
+            items = list(table.items())
+        return [(dict(key[1]), value) for key, value in items
+                if key[0] == name and all(dict(key[1]).get(k) == v for k, v in labels.items())]
+
+    def total(self, name, **labels):
+        return sum(value for _, value in self.select(self.counters, name, labels))
+
+    def histogram(self, name, **labels):
+        merged = Histogram()
+        for _, histogram in self.select(self.histograms, name, labels):
+            merged.merge(histogram)
+        return merged
+
+    def account_stats(self, account):
+        with self.lock:
+            started = self.started.get(account)
+        hours = (monotonic() - started) / 3600 if started else 0.0
+        requests = self.select(self.counters, 'requests_total', {'account': account})
+        latency = {}
+        for labels, _ in self.select(self.histograms, 'request_seconds', {'account': account}):
+            histogram = self.histogram('request_seconds', account=account, endpoint=labels['endpoint'])
+            latency[labels['endpoint']] = {'count': histogram.count, 'p50': histogram.quantile(0.5),
+                                           'p99': histogram.quantile(0.99)}
+        xp = self.total('xp_total', account=account)
+        return {
+            'battles': self.total('battles_total', account=account),
+            'wins': self.total('wins_total', account=account),
+            'losses': self.total('losses_total', account=account),
+            'xp': xp,
+            'xp_per_hour': xp / hours if hours else 0.0,
+            'requests': sum(value for _, value in requests),
+            'retries': self.total('retries_total', account=account),
+            'throttled': sum(value for labels, value in requests if labels['status'] == '429'),
+            'errors': sum(value for labels, value in requests if labels['status'] == 'error' or labels['status'].startswith('5')),
+            'latency': latency,
+            'sleep': {labels['kind']: value for labels, value in self.select(self.counters, 'sleep_seconds_total', {'account': account})},
+        }
+
+    def accounts(self):
+        with self.lock:
+            return sorted(self.started)
+
+    def snapshot(self):
+        with self.lock:
+            counters = list(self.counters.items())
+            histograms = [(key, list(h.counts), h.sum, h.count) for key, h in self.histograms.items()]
+        return {
+            'created': self.created,
+            'time': time(),
+            'accounts': {str(account): self.account_stats(account) for account in self.accounts()},
+            'counters': [{'name': key[0], 'labels': {k: str(v) for k, v in key[1]}, 'value': value}
+                         for key, value in counters],
+            'histograms': [{'name': key[0], 'labels': {k: str(v) for k, v in key[1]}, 'buckets': list(latency_buckets),
+                            'counts': counts, 'sum': total, 'count': count}
+                           for key, counts, total, count in histograms],
+        }
+
+    def prometheus(self):
+        def labels_text(labels, extra=()):
+            pairs = [f'{k}="{v}"' for k, v in labels] + [f'{k}="{v}"' for k, v in extra]
+            return '{' + ','.join(pairs) + '}' if pairs else ''
+
+        with self.lock:
+            counters = sorted(self.counters.items(), key=lambda item: (item[0][0], str(item[0][1])))
+            histograms = sorted(((key, list(h.counts), h.sum, h.count) for key, h in self.histograms.items()),
+                                key=lambda item: (item[0][0], str(item[0][1])))
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {self.prefix}_{name} counter')
+            lines.append(f'{self.prefix}_{name}{labels_text(labels)} {value}')
+        for (name, labels), counts, total, count in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {self.prefix}_{name} histogram')
+            cumulative = 0
+            for bound, n in zip(list(latency_buckets) + ['+Inf'], counts):
+                cumulative += n
+                lines.append(f'{self.prefix}_{name}_bucket{labels_text(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.prefix}_{name}_sum{labels_text(labels)} {total}')
+            lines.append(f'{self.prefix}_{name}_count{labels_text(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        # .json gets the JSON snapshot, anything else Prometheus text. Written
+        # to a temp file first so a scraper never sees half a file.
+        if path.endswith('.json'):
+            text = json.dumps(self.snapshot(), indent=1)
+        else:
+            text = self.prometheus()
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+        return path
+
+
+registry = Metrics()
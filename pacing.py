@@ -0,0 +1,72 @@
+from threading import Lock
+from time import monotonic
+from urllib.parse import urlsplit
+
+
+class AdaptivePacer:
+    # Spaces requests to one host across every account using it. The
+    # interval doubles on 429, grows on 5xx, timeouts or rising latency, and
+    # shrinks by only a small fraction per healthy response, so it backs off
+    # fast and creeps back toward min_interval slowly.
+    def __init__(self, interval=1.0, min_interval=0.2, max_interval=120.0, recover=0.02,
+                 alpha=0.2, baseline_alpha=0.02, slow_factor=2.0, clock=monotonic):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.recover = recover
+        self.alpha = alpha
+        self.baseline_alpha = baseline_alpha
+        self.slow_factor = slow_factor
+        self.clock = clock
+        self.latency = None
+        self.baseline = None
+        self.next_slot = 0.0
+        self.hold_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.lock = Lock()
+
+    def reserve(self, limit=None):
+        # Claims the next request slot and returns how long to wait for it,
+        # or None without claiming anything if that is more than limit.
+        with self.lock:
+            now = self.clock()
+            slot = max(now, self.next_slot, self.hold_until)
+            if limit is not None and slot - now > limit:
+                return None
+            self.next_slot = slot + self.interval
+            return slot - now
+
+    def observe(self, status, latency, retry_after=None):
+        with self.lock:
+            self.requests += 1
+            if status == 429:
+                self.throttled += 1
+                self.interval = min(self.max_interval, self.interval * 2)
+                if retry_after:
+                    self.hold_until = max(self.hold_until, self.clock() + retry_after)
+            elif status is None or status >= 500:
+                self.errors += 1
+                self.interval = min(self.max_interval, self.interval * 1.5)
+            else:
+                if self.latency is None:
+                    self.latency = self.baseline = latency
+                else:
+                    self.latency += self.alpha * (latency - self.latency)
+                    self.baseline += self.baseline_alpha * (latency - self.baseline)
+                if self.latency > self.slow_factor * self.baseline:
+                    self.interval = min(self.max_interval, self.interval * 1.1)
+                else:
+                    self.interval = max(self.min_interval, self.interval * (1 - self.recover))
+
+
+_pacers = {}
+_pacers_lock = Lock()
+
+def pacer_for(url, interval=1.0, min_interval=0.2):
+    host = urlsplit(url).netloc
+    with _pacers_lock:
+        if host not in _pacers:
+            _pacers[host] = AdaptivePacer(interval=interval, min_interval=min_interval)
+        return _pacers[host]
@@ -0,0 +1,83 @@
+import os
+import json
+
+profiles_path = os.environ.get('DARCOB_PROFILES', 'darcob_profiles.json')
+
+# (key, label, kind) for every field of an account profile, in form order.
+profile_fields = (
+    ('name', 'Profile Name', 'text'),
+    ('restore_key', 'Restore Key', 'text'),
+    ('power', 'Power', 'int'),
+    ('min_level', 'Level Up to Attack', 'int'),
+    ('min_level_storage', 'Level Up to Save Database', 'int'),
+    ('attacks_per_player', 'Number of Attacks to Enemy', 'int'),
+    ('rest_after_attacks', 'Rest After How Many Attacks', 'int'),
+    ('rest_duration', 'Rest Duration (seconds)', 'int'),
+    ('attack_speed', 'Attack Speed (seconds)', 'float'),
+    ('request_speed', 'Request Speed (seconds)', 'float'),
+    ('card_cooldown', 'Card Cooldown (seconds)', 'int'),
+    ('card_reject_cooldown', 'Rejected Card Cooldown (seconds)', 'int'),
+    ('save_to_db', 'Save to DB (Yes/No)', 'bool'),
+    ('resume', 'Resume Last Session (Yes/No)', 'bool'),
+)
+
+
+def valid_field(kind, text):
+    # Empty is always fine: account_config falls back to the default.
+    if not text:
+        return True
+    try:
+        if kind == 'int':
+            int(text)
+        elif kind == 'float':
+            float(text)
+        elif kind == 'bool':
+            return text.lower() in ['yes', 'no']
+    except ValueError:
+        return False
+    return True
+
+
+def profile_name(profile, index):
+    return profile.get('name') or f'Account {index + 1}'
+
+
+class ProfileStore:
+    # Saved accounts as a JSON list of field -> text dicts, plus a
+    # 'selected' flag. The same file can be handed to cli.py.
+    def __init__(self, path=None):
+        self.path = path or profiles_path
+        self.profiles = []
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                profiles = json.load(f)
+        except (OSError, ValueError):
+            profiles = []
+        self.profiles = [p for p in profiles if isinstance(p, dict)] if isinstance(profiles, list) else []
+        return self
+
+    def save(self):
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.profiles, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    def put(self, profile, index=None):
+        if index is None or index >= len(self.profiles):
+            self.profiles.append(profile)
+        else:
+            self.profiles[index] = profile
+        self.save()
+
+    def remove(self, index):
+        del self.profiles[index]
+        self.save()
+
+    def select(self, index, selected):
+        self.profiles[index]['selected'] = selected
+        self.save()
+
+    def selected(self):
+        return [p for p in self.profiles if p.get('selected', True)]
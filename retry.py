@@ -0,0 +1,82 @@
+from random import random
+from time import monotonic, time
+from email.utils import parsedate_to_datetime
+
+
+class RetryPolicy:
+    def __init__(self, attempts=5, base_delay=1.0, max_delay=30.0, budget=60.0, timeout=5.0,
+                 jitter=0.5, retry_statuses=(429, 500, 502, 503, 504)):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.timeout = timeout
+        self.jitter = jitter
+        self.retry_statuses = retry_statuses
+
+    def backoff(self, retry):
+        delay = min(self.max_delay, self.base_delay * 2 ** retry)
+        return delay * (1 - self.jitter * random())
+
+
+# Worst case for one logical call is bounded by the policy budget; retries
+# never outlive it, whatever the server sends in Retry-After.
+retry_policies = {
+    'player/load': RetryPolicy(attempts=5, base_delay=2, max_delay=15, budget=45),
+    'battle/getopponents': RetryPolicy(attempts=4, base_delay=2, max_delay=15, budget=40),
+    'battle/battle': RetryPolicy(attempts=4, base_delay=3, max_delay=30, budget=60),
+}
+
+
+def retry_after(response):
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryCall:
+    # Attempt bookkeeping for one logical request. Iterating yields attempt
+    # numbers until the attempts or the time budget run out.
+    def __init__(self, policy, clock=monotonic):
+        self.policy = policy
+        self.clock = clock
+        self.deadline = clock() + policy.budget
+        self.attempt = 0
+        self.retries = 0
+        self.deferred = False
+
+    def __iter__(self):
+        while self.attempt < self.policy.attempts and self.remaining() > 0:
+            self.attempt += 1
+            yield self.attempt
+
+    def remaining(self):
+        return self.deadline - self.clock()
+
+    def slot_limit(self):
+        # Longest wait for a pacer slot that still leaves the request its
+        # full timeout inside the budget.
+        return max(0.0, self.remaining() - self.policy.timeout)
+
+    def timeout(self):
+        return max(0.1, min(self.policy.timeout, self.remaining()))
+
+    def retry_delay(self, response=None):
+        # Seconds to wait before the next attempt, or None to give up now.
+        if self.attempt >= self.policy.attempts:
+            return None
+        delay = retry_after(response)
+        if delay is None:
+            delay = self.policy.backoff(self.retries)
+        if delay >= self.remaining():
+            return None
+        self.retries += 1
+        return delay
@@ -0,0 +1,80 @@
+from heapq import nlargest
+from math import exp
+
+
+class TargetSelector:
+    # Ranks enemies by expected XP per battle request. The win probability
+    # starts from a logistic prior on the power gap and is pulled toward
+    # what actually happened against that enemy; enemies that keep beating
+    # us land in a set and are skipped without another request.
+    def __init__(self, my_power=0, prior_weight=2.0, gap_scale=0.25,
+                 strong_probability=0.3, default_xp=1.0):
+        self.my_power = my_power
+        self.prior_weight = prior_weight
+        self.gap_scale = gap_scale
+        self.strong_probability = strong_probability
+        self.default_xp = default_xp
+        self.stats = {}
+        self.strong = set()
+        self.total_xp = 0
+        self.total_wins = 0
+
+    def load(self, rows):
+        for enemy_id, wins, losses, xp, power in rows:
+            self.stats[enemy_id] = [wins, losses, xp, power]
+            self.total_xp += xp
+            self.total_wins += wins
+            self.classify(enemy_id)
+
+    def prior(self, power):
+        if not self.my_power or power is None:
+            return 0.5
+        gap = (self.my_power - power) / (self.my_power * self.gap_scale)
+        return 1 / (1 + exp(-max(-30.0, min(30.0, gap))))
+
+    def win_probability(self, enemy_id, power):
+        wins, losses = self.stats.get(enemy_id, (0, 0))[:2]
+        return (wins + self.prior_weight * self.prior(power)) / (wins + losses + self.prior_weight)
+
+    def expected_xp(self, enemy_id):
+        stats = self.stats.get(enemy_id)
+        if stats and stats[0]:
+            return stats[2] / stats[0]
+        if self.total_wins:
+            return self.total_xp / self.total_wins
+        return self.default_xp
+
+    def score(self, enemy):
+        return self.win_probability(enemy.id, enemy.power) * self.expected_xp(enemy.id)
+
+    def is_strong(self, enemy_id):
+        return enemy_id in self.strong
+
+    def classify(self, enemy_id):
+        wins, losses, _, power = self.stats[enemy_id]
+        if losses and self.win_probability(enemy_id, power) < self.strong_probability:
+            self.strong.add(enemy_id)
+        else:
+            self.strong.discard(enemy_id)
+
+    def record(self, enemy_id, power, won, xp=0):
+        stats = self.stats.setdefault(enemy_id, [0, 0, 0, power])
+        stats[3] = power
+        if won:
+            stats[0] += 1
+            stats[2] += xp
+            self.total_wins += 1
+            self.total_xp += xp
+        else:
+            stats[1] += 1
+        self.classify(enemy_id)
+
+    def rank(self, enemies, limit=None):
+        # sorted() is stable, so ties keep the reader's (power, level) order.
+        # With a limit only the best `limit` enemies are ever held, so a
+        # streamed table is ranked without materializing it; nlargest keeps
+        # the same tie order.
+        candidates = (e for e in enemies if e.id not in self.strong)
+        if limit is None:
+            return sorted(candidates, key=self.score, reverse=True)
+        return nlargest(limit, candidates, key=self.score)
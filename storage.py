@@ -0,0 +1,502 @@
+import json
+import sqlite3
+import threading
+from collections import namedtuple
+from time import monotonic, time
+from queue import Queue, Empty
+from journal import journal
+
+db_pragmas = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-8000',
+    'PRAGMA busy_timeout=5000',
+)
+
+stale_ttl = 14 * 86400
+seen_refresh = 3600
+maintenance_delay = 60
+maintenance_interval = 6 * 3600
+
+# One stored opponent as the battle loop sees it: a plain tuple, so a round
+# of them costs a fraction of the equivalent dicts.
+Opponent = namedtuple('Opponent', 'id power level league')
+
+upsert_player_sql = '''INSERT INTO Accounts (id, power, level, league, first_seen, last_seen)
+                       VALUES (?1, ?2, ?3, ?4, ?5, ?5)
+                       ON CONFLICT(id) DO UPDATE SET
+                           power=excluded.power,
+                           level=excluded.level,
+                           league=excluded.league,
+                           last_seen=excluded.last_seen'''
+
+record_outcome_sql = '''INSERT INTO Outcomes (attacker, id, wins, losses, xp, power, last_result, updated_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(attacker, id) DO UPDATE SET
+                            wins=wins + excluded.wins,
+                            losses=losses + excluded.losses,
+                            xp=xp + excluded.xp,
+                            power=excluded.power,
+                            last_result=excluded.last_result,
+                            updated_at=excluded.updated_at'''
+
+checkpoint_sql = '''INSERT INTO Checkpoints (attacker, q, win, lost, xp, doon, attack_count, attacked, position, enemy_attacks, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(attacker) DO UPDATE SET
+                        q=excluded.q,
+                        win=excluded.win,
+                        lost=excluded.lost,
+                        xp=excluded.xp,
+                        doon=excluded.doon,
+                        attack_count=excluded.attack_count,
+                        attacked=excluded.attacked,
+                        position=excluded.position,
+                        enemy_attacks=excluded.enemy_attacks,
+                        updated_at=excluded.updated_at'''
+
+card_usage_sql = '''INSERT INTO CardUsage (attacker, card, uses, wins, losses, rejected, last_used, last_rejected)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(attacker, card) DO UPDATE SET
+                        uses=excluded.uses,
+                        wins=excluded.wins,
+                        losses=excluded.losses,
+                        rejected=excluded.rejected,
+                        last_used=excluded.last_used,
+                        last_rejected=excluded.last_rejected'''
+
+checkpoint_round_sql = '''INSERT INTO Checkpoints (attacker, round, position, enemy_attacks, updated_at)
+                          VALUES (?, ?, 0, 0, ?)
+                          ON CONFLICT(attacker) DO UPDATE SET
+                              round=excluded.round,
+                              position=0,
+                              enemy_attacks=0,
+                              updated_at=excluded.updated_at'''
+
+def league_db_path(league):
+    return f'Leage_{league}.db'
+
+def create_or_open_db(db_path, check_same_thread=True):
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+    for pragma in db_pragmas:
+        conn.execute(pragma)
+    cursor = conn.cursor()
+    cursor.execute('''CREATE TABLE IF NOT EXISTS Accounts (
+                        id TEXT UNIQUE,
+                        power NUMERIC,
+                        level NUMERIC,
+                        league NUMERIC,
+                        PRIMARY KEY(id))''')
+    cursor.execute('''CREATE INDEX IF NOT EXISTS idx_accounts_power_level
+                      ON Accounts(power, level DESC, id, league)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS StrongPlayers (
+                        id TEXT UNIQUE,
+                        PRIMARY KEY(id))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS WeakPlayers (
+                        id TEXT UNIQUE,
+                        PRIMARY KEY(id))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS Outcomes (
+                        attacker TEXT,
+                        id TEXT,
+                        wins INTEGER DEFAULT 0,
+                        losses INTEGER DEFAULT 0,
+                        xp INTEGER DEFAULT 0,
+                        power NUMERIC,
+                        last_result INTEGER,
+                        updated_at REAL,
+                        PRIMARY KEY(attacker, id))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS Checkpoints (
+                        attacker TEXT,
+                        q TEXT,
+                        win INTEGER DEFAULT 0,
+                        lost INTEGER DEFAULT 0,
+                        xp INTEGER DEFAULT 0,
+                        doon INTEGER DEFAULT 0,
+                        attack_count INTEGER DEFAULT 0,
+                        attacked TEXT,
+                        round TEXT,
+                        position INTEGER DEFAULT 0,
+                        enemy_attacks INTEGER DEFAULT 0,
+                        updated_at REAL,
+                        PRIMARY KEY(attacker))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS CardUsage (
+                        attacker TEXT,
+                        card INTEGER,
+                        uses INTEGER DEFAULT 0,
+                        wins INTEGER DEFAULT 0,
+                        losses INTEGER DEFAULT 0,
+                        rejected INTEGER DEFAULT 0,
+                        last_used REAL,
+                        last_rejected INTEGER DEFAULT 0,
+                        PRIMARY KEY(attacker, card))''')
+    conn.commit()
+    migrate(conn)
+    return conn, cursor
+
+
+def migrate_timestamps(conn):
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(Accounts)')}
+    for column in ('first_seen', 'last_seen', 'last_attacked'):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE Accounts ADD COLUMN {column} REAL')
+    # Rows from before this migration count as seen now, so they get one
+    # full TTL to show up again before they are evicted.
+    now = time()
+    conn.execute('UPDATE Accounts SET first_seen = ?, last_seen = ? WHERE last_seen IS NULL', (now, now))
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_accounts_last_seen ON Accounts(last_seen)')
+
+
+def migrate_incremental_vacuum(conn):
+    # auto_vacuum only changes on a VACUUM; after this one, freed pages can be
+    # returned a few at a time with PRAGMA incremental_vacuum.
+    conn.commit()
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute('VACUUM')
+
+
+def migrate_checkpoint_cards(conn):
+    # The card order is rebuilt from CardUsage; the copy the checkpoint kept
+    # was never read back. Older SQLite cannot drop it, and it stays unused.
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(Checkpoints)')}
+    if 'cards' in columns and sqlite3.sqlite_version_info >= (3, 35, 0):
+        conn.execute('ALTER TABLE Checkpoints DROP COLUMN cards')
+
+
+def migrate_verdict_timestamps(conn):
+    # Older verdicts count as renewed now, like the Accounts rows above.
+    now = time()
+    for table in ('StrongPlayers', 'WeakPlayers'):
+        if 'updated_at' not in {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN updated_at REAL')
+        conn.execute(f'UPDATE {table} SET updated_at = ? WHERE updated_at IS NULL', (now,))
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table.lower()}_updated_at ON {table}(updated_at)')
+
+
+# Append only: PRAGMA user_version is the number of entries already applied.
+migrations = (migrate_timestamps, migrate_incremental_vacuum, migrate_checkpoint_cards, migrate_verdict_timestamps)
+
+def migrate(conn):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, migration in enumerate(migrations[version:], version + 1):
+        migration(conn)
+        conn.execute(f'PRAGMA user_version={number}')
+        conn.commit()
+
+
+def evict_stale(conn, ttl=stale_ttl, now=None):
+    # Opponents not returned by getopponents and not attacked within ttl:
+    # they changed league, outlevelled the filter or stopped playing.
+    # Verdicts go by their own age: with save_to_db off their opponents are
+    # never in Accounts, and a verdict renewed within ttl is still learned.
+    cutoff = (now or time()) - ttl
+    evicted = conn.execute('DELETE FROM Accounts WHERE last_seen < ? AND (last_attacked IS NULL OR last_attacked < ?)',
+                           (cutoff, cutoff)).rowcount
+    for table in ('StrongPlayers', 'WeakPlayers'):
+        evicted += conn.execute(f'DELETE FROM {table} WHERE updated_at < ?', (cutoff,)).rowcount
+    return evicted
+
+
+def player_rows(players, min_level_for_storage, seen=None):
+    seen = seen or time()
+    return [(*p, seen) for p in players if p.level >= min_level_for_storage]
+
+
+def enemies_from_players(players, min_level, max_power=None):
+    enemies = [Opponent(p.id, p.def_power, p.level, p.league_id)
+               for p in players
+               if p.level >= min_level and (max_power is None or p.def_power <= max_power)]
+    enemies.sort(key=lambda x: (x.power, -x.level, x.id))
+    return enemies
+
+
+class EnemyReader:
+    # Long-lived read connection for one worker thread. Enemies come back in
+    # (power, level DESC, id) order straight from idx_accounts_power_level,
+    # which covers every selected column, so a page is an index range read
+    # with no table lookups and no sort step.
+    def __init__(self, db_path, check_same_thread=True):
+        self.db_path = db_path
+        self.check_same_thread = check_same_thread
+        self.conn = None
+
+    def connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=self.check_same_thread)
+            self.conn.execute('PRAGMA query_only=ON')
+        return self.conn
+
+    def page_cursor(self, min_level, max_power=None, limit=200, after=None):
+        sql = 'SELECT id, power, level, league FROM Accounts WHERE level >= ?'
+        params = [min_level]
+        if max_power is not None:
+            sql += ' AND power <= ?'
+            params.append(max_power)
+        if after is not None:
+            sql += ' AND power >= ? AND (power > ? OR (power = ? AND (level < ? OR (level = ? AND id > ?))))'
+            params += [after.power, after.power, after.power, after.level, after.level, after.id]
+        sql += ' ORDER BY power, level DESC, id LIMIT ?'
+        params.append(limit)
+        return self.connect().execute(sql, params)
+
+    def outcomes(self, attacker):
+        return self.connect().execute(
+            'SELECT id, wins, losses, xp, power FROM Outcomes WHERE attacker = ?', (attacker,)).fetchall()
+
+    def card_usage(self, attacker):
+        return self.connect().execute(
+            'SELECT card, uses, wins, losses, rejected, last_used, last_rejected FROM CardUsage WHERE attacker = ?',
+            (attacker,)).fetchall()
+
+    def checkpoint(self, attacker):
+        cursor = self.connect().execute(
+            'SELECT q, win, lost, xp, doon, attack_count, attacked, round, position, enemy_attacks '
+            'FROM Checkpoints WHERE attacker = ?', (attacker,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip((c[0] for c in cursor.description), row))
+
+    def iter_enemies(self, min_level, max_power=None, page_size=200):
+        # Rows are handed out as the cursor steps; nothing beyond the row in
+        # hand is kept. Each page is its own short read, so the writer can
+        # checkpoint the WAL in between.
+        after = None
+        while True:
+            count = 0
+            for after in map(Opponent._make, self.page_cursor(min_level, max_power, page_size, after)):
+                count += 1
+                yield after
+            if count < page_size:
+                return
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class DBWriter(threading.Thread):
+    # The only thread that writes to db_path. Callers queue (sql, rows)
+    # batches and return immediately; whatever is queued by the time the
+    # writer wakes up is committed together in one transaction.
+    def __init__(self, db_path, max_group=64, stale_ttl=stale_ttl, maintenance_interval=maintenance_interval):
+        super().__init__(daemon=True, name=f'DBWriter({db_path})')
+        self.db_path = db_path
+        self.max_group = max_group
+        self.stale_ttl = stale_ttl
+        self.maintenance_interval = maintenance_interval
+        self.next_maintenance = monotonic() + maintenance_delay
+        self.evicted = 0
+        self.queue = Queue()
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+        self.known = {}
+        self.users = 0
+        self.rows_written = 0
+        self.commits = 0
+        self.errors = 0
+        self.last_error = None
+        self.open_error = None
+
+    def start(self):
+        # Every user of the writer may call this: the first one starts the
+        # thread, and all of them wait for the database to open and get its
+        # error if it could not.
+        with self.lock:
+            if self.ident is None:
+                super().start()
+        self.ready.wait()
+        if self.open_error is not None:
+            raise self.open_error
+        return self
+
+    def write(self, sql, rows):
+        if rows:
+            self.queue.put((sql, rows))
+
+    def upsert_players(self, players, min_level_for_storage):
+        # Accounts sharing a league store hand in the same opponents; only
+        # rows that changed since they were last queued reach the disk, plus
+        # unchanged ones whose last_seen is over seen_refresh old.
+        rows = []
+        now = time()
+        with self.lock:
+            for row in player_rows(players, min_level_for_storage, now):
+                key = hash(row[:-1])
+                known = self.known.get(row[0])
+                if known is None or known[0] != key or now - known[1] >= seen_refresh:
+                    self.known[row[0]] = (key, now)
+                    rows.append(row)
+        self.write(upsert_player_sql, rows)
+
+    def record_outcome(self, attacker, enemy_id, power, won, xp=0):
+        # Wins and losses are also mirrored into WeakPlayers/StrongPlayers as
+        # the latest verdict for that enemy.
+        self.write(record_outcome_sql, [(attacker, enemy_id, int(won), int(not won), xp, power, int(won), time())])
+        self.write(f'INSERT OR REPLACE INTO {"WeakPlayers" if won else "StrongPlayers"} (id, updated_at) VALUES (?, ?)',
+                   [(enemy_id, time())])
+        self.write(f'DELETE FROM {"StrongPlayers" if won else "WeakPlayers"} WHERE id = ?', [(enemy_id,)])
+        self.write('UPDATE Accounts SET last_attacked = ? WHERE id = ?', [(time(), enemy_id)])
+
+    def record_card(self, attacker, usage):
+        # usage is the card's running totals from CardScheduler.record.
+        self.write(card_usage_sql, [(attacker, *usage[:6], int(usage[6]))])
+
+    def save_checkpoint(self, attacker, q, win, lost, xp, doon, attack_count, attacked, position, enemy_attacks):
+        self.write(checkpoint_sql, [(attacker, q, win, lost, xp, doon, attack_count,
+                                     json.dumps(attacked), position, enemy_attacks, time())])
+
+    def save_round(self, attacker, enemies):
+        # The round's enemy list is only written when a round starts; the
+        # per-battle checkpoints above just move the position within it.
+        self.write(checkpoint_round_sql, [(attacker, json.dumps(enemies), time())])
+
+    def flush(self, timeout=None):
+        done = threading.Event()
+        self.queue.put((None, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        if self.is_alive():
+            self.queue.put(None)
+            self.join(timeout)
+
+    def maintain(self, conn):
+        # Runs on the writer thread between groups, so it never races a
+        # write. Each step is bounded: eviction uses the last_seen and
+        # updated_at indexes, incremental_vacuum only returns free pages and
+        # ANALYZE samples.
+        try:
+            with conn:
+                evicted = evict_stale(conn, self.stale_ttl)
+            # execute() steps the pragma once, which frees a single page;
+            # executescript() runs it to completion.
+            conn.executescript('PRAGMA incremental_vacuum')
+            conn.execute('PRAGMA analysis_limit=1000')
+            conn.execute('ANALYZE')
+            conn.commit()
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+            self.evicted += evicted
+        except sqlite3.Error as e:
+            self.errors += 1
+            self.last_error = e
+        self.next_maintenance = monotonic() + self.maintenance_interval
+
+    def replay(self, conn, batches):
+        for sql, rows in batches:
+            try:
+                with conn:
+                    conn.executemany(sql, rows)
+                self.commits += 1
+                self.rows_written += len(rows)
+            except sqlite3.Error as e:
+                self.errors += 1
+                self.last_error = e
+                journal.event('db_error', db=self.db_path, sql=' '.join(sql.split()), rows=len(rows), error=str(e))
+
+    def run(self):
+        try:
+            conn, cursor = create_or_open_db(self.db_path)
+        except Exception as e:
+            self.open_error = e
+            return
+        finally:
+            self.ready.set()
+        running = True
+        while running:
+            try:
+                group = [self.queue.get(timeout=max(0.0, self.next_maintenance - monotonic()))]
+            except Empty:
+                self.maintain(conn)
+                continue
+            while len(group) < self.max_group:
+                try:
+                    group.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            # Seen before executing anything, so a failing statement in the
+            # same group cannot swallow the close request.
+            if None in group:
+                running = False
+            batches = [item for item in group if item is not None and item[0] is not None]
+            waiters = [item[1] for item in group if item is not None and item[0] is None]
+            try:
+                with conn:
+                    for sql, rows in batches:
+                        cursor.executemany(sql, rows)
+                self.commits += 1
+                self.rows_written += sum(len(rows) for _, rows in batches)
+            except sqlite3.Error:
+                # The group was rolled back. Each batch gets its own
+                # transaction so only the one that fails is lost.
+                self.replay(conn, batches)
+            for waiter in waiters:
+                waiter.set()
+            if running and monotonic() >= self.next_maintenance:
+                self.maintain(conn)
+        conn.close()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def acquire_writer(db_path):
+    # Started outside the lock: opening a database runs its migrations, and
+    # a slow or failing open must not hold up accounts in other leagues.
+    with _writers_lock:
+        writer = _writers.get(db_path)
+        if writer is None or (writer.ready.is_set() and not writer.is_alive()):
+            writer = _writers[db_path] = DBWriter(db_path)
+        writer.users += 1
+    try:
+        return writer.start()
+    except Exception:
+        release_writer(writer)
+        raise
+
+def release_writer(writer):
+    with _writers_lock:
+        writer.users -= 1
+        if writer.users > 0:
+            return
+        if _writers.get(writer.db_path) is writer:
+            del _writers[writer.db_path]
+    writer.close()
+
+
+class OpponentCache:
+    # getopponents results per league, shared by every worker thread. Only
+    # one thread fetches a missing or expired league at a time; the others
+    # wait for its result instead of sending the same request.
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.fetching = {}
+
+    def get(self, league):
+        with self.lock:
+            entry = self.entries.get(league)
+        if entry and monotonic() - entry[0] < self.ttl:
+            return entry[1]
+        return None
+
+    def put(self, league, players):
+        if players:
+            with self.lock:
+                self.entries[league] = (monotonic(), players)
+
+    def claim(self, league):
+        # None if the caller is to fetch the league and then release() it,
+        # else an event that is set once the fetch in flight has finished.
+        with self.lock:
+            pending = self.fetching.get(league)
+            if pending is None:
+                self.fetching[league] = threading.Event()
+            return pending
+
+    def release(self, league, players):
+        self.put(league, players)
+        with self.lock:
+            self.fetching.pop(league).set()
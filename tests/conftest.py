@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# The modules sit at the repo root, next to main.py, and are imported bare.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# An empty path turns the engine's journal off.
+os.environ['DARCOB_JOURNAL'] = ''
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
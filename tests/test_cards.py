@@ -0,0 +1,64 @@
+from cards import CardScheduler
+
+
+def scheduler(cards=(1, 2, 3), **kwargs):
+    return CardScheduler(list(cards), **{'cooldown': 60, 'reject_cooldown': 300, **kwargs})
+
+
+def test_same_card_until_recorded():
+    cards = scheduler()
+    first = cards.pick(now=1000)
+    assert cards.pick(now=1001) == first
+    cards.record(first, True, now=1002)
+    assert cards.pick(now=1003) != first
+
+
+def test_best_win_rate_first():
+    cards = scheduler()
+    cards.load([(2, 10, 9, 1, 0, 0.0, 0), (3, 10, 1, 9, 0, 0.0, 0)], now=1000)
+    assert cards.pick(now=1000) == 2
+
+
+def test_least_recently_used_breaks_ties():
+    cards = scheduler()
+    cards.load([(1, 1, 0, 0, 0, 500.0, 0), (2, 1, 0, 0, 0, 400.0, 0), (3, 1, 0, 0, 0, 600.0, 0)], now=1000)
+    assert [cards.record(cards.pick(now=1000), None, now=1000)[0] for _ in range(3)] == [2, 1, 3]
+
+
+def test_used_card_cools_down():
+    cards = scheduler(cards=(1, 2))
+    card = cards.pick(now=1000)
+    cards.record(card, True, now=1000)
+    other = cards.pick(now=1001)
+    cards.record(other, True, now=1001)
+    assert cards.pick(now=1061) == card
+
+
+def test_rejected_card_rests_longer():
+    cards = scheduler(cards=(1, 2))
+    cards.load([(1, 0, 0, 0, 0, 0.0, 0), (2, 5, 0, 5, 0, 0.0, 0)], now=1000)
+    assert cards.pick(now=1000) == 1
+    row = cards.record(1, None, now=1000)
+    assert row == (1, 1, 0, 0, 1, 1000, True)
+    cards.record(cards.pick(now=1000), False, now=1000)
+    # 2 is ready again after 60s; 1 only after 300s.
+    assert cards.pick(now=1100) == 2
+
+
+def test_all_cooling_uses_the_first_to_free_up():
+    cards = scheduler(cards=(1, 2))
+    cards.record(cards.pick(now=1000), True, now=1000)
+    cards.record(cards.pick(now=1010), True, now=1010)
+    assert cards.pick(now=1020) == cards.pick(now=1020) == 1
+
+
+def test_load_restores_cooldowns_and_ignores_unknown_cards():
+    cards = scheduler(cards=(1, 2))
+    cards.load([(1, 3, 3, 0, 0, 990.0, 0), (9, 1, 1, 0, 0, 0.0, 0)], now=1000)
+    assert cards.ids() == [1, 2]
+    assert cards.pick(now=1000) == 2
+    assert cards.stats[1][:3] == [3, 3, 0]
+
+
+def test_record_unknown_card():
+    assert scheduler().record(42, True) is None
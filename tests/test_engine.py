@@ -0,0 +1,171 @@
+import asyncio
+
+from queue import Queue
+
+import pytest
+from requests.exceptions import ConnectionError, ReadTimeout
+
+import engine
+from accounts import Reporter
+from decoding import PlayerRecord
+from pacing import AdaptivePacer
+from retry import RetryPolicy
+from storage import Opponent, create_or_open_db
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, content=b'{"status": true, "data": {"xp_added": 3}}'):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, url, data=None, timeout=None):
+        self.requests.append((method, url, timeout))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class FakeWriter:
+    def __init__(self):
+        self.cards = []
+
+    def record_card(self, attacker, usage):
+        self.cards.append(usage)
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class FakeTransport(FakeSession):
+    async def request(self, method, url, timeout, data=None):
+        return FakeSession.request(self, method, url, data, timeout)
+
+
+@pytest.fixture
+def pacer(monkeypatch):
+    pacer = AdaptivePacer(interval=2.0)
+    monkeypatch.setattr(engine, 'pacer_for', lambda *args: pacer)
+    monkeypatch.setitem(engine.retry_policies, 'battle/battle',
+                       RetryPolicy(attempts=3, base_delay=0.01, max_delay=0.01, budget=0.3, timeout=0.1, jitter=0))
+    return pacer
+
+
+def test_battle_goes_through(pacer):
+    session = FakeSession(FakeResponse())
+    assert engine.battle(session, '101', 'q', [1], Reporter(1))['data']['xp_added'] == 3
+    assert len(session.requests) == 1
+
+
+def test_pacer_hold_past_the_budget_defers_the_battle(pacer):
+    # A Retry-After longer than the whole battle budget.
+    pacer.observe(429, 0.1, retry_after=60)
+    interval = pacer.interval
+    session = FakeSession()
+    assert engine.battle(session, '101', 'q', [1], Reporter(1)) is engine.DEFERRED
+    assert session.requests == []
+    assert pacer.interval == interval and pacer.errors == 0
+
+
+def test_server_errors_are_retried_and_reported_to_the_pacer(pacer):
+    pacer.interval = 0.0
+    session = FakeSession(ConnectionError('reset'), FakeResponse(503), FakeResponse())
+    assert engine.battle(session, '101', 'q', [1], Reporter(1))['data']['xp_added'] == 3
+    assert len(session.requests) == 3
+    assert pacer.errors == 2
+
+
+def test_undecodable_reply_is_a_failed_battle(pacer):
+    session = FakeSession(FakeResponse(content=b'<html>Bad Gateway</html>'))
+    assert engine.battle(session, '101', 'q', [1], Reporter(1)) == {}
+    assert len(session.requests) == 1
+
+
+def test_undecodable_replies_do_not_stall_the_round(pacer, tmp_path, monkeypatch):
+    # Each enemy gets one failed battle and the round moves on.
+    monkeypatch.setattr(engine, 'analyze_delay', 0)
+    pacer.interval = 0.0
+    reporter = Reporter(1)
+
+    class StoppingSession(FakeSession):
+        def request(self, *args, **kwargs):
+            if len(self.requests) == 1:
+                reporter.stop_event.set()
+            return super().request(*args, **kwargs)
+
+    db_file = str(tmp_path / 'league.db')
+    create_or_open_db(db_file)[0].close()
+    targets = Queue()
+    for player_id in '12':
+        targets.put(PlayerRecord(player_id, 10, 5, 3))
+    session = StoppingSession(*[FakeResponse(content=b'') for _ in range(2)])
+    steps = engine.attack_steps(FakeWriter(), db_file, 3, 0, 0, [1], 3, {'data': {'q': 'q', 'id': 7}},
+                                100, 0, 0, 0, reporter, targets=targets)
+    engine.run_steps(steps, session, reporter)
+    assert [url.split('opponent_id=')[1][0] for _, url, _ in session.requests] == ['1', '2']
+
+
+def test_only_a_server_rejection_benches_the_card():
+    writer = FakeWriter()
+    state = engine.AttackState({'data': {'q': 'q', 'id': 7}}, [1, 2], engine.TargetSelector(0), writer, Reporter(1),
+                               card_cooldown=5, card_reject_cooldown=50)
+    enemy = Opponent('101', 10, 5, 3)
+    card = state.cards.pick()
+    # No answer at all: the card is kept for the next battle.
+    state.record(enemy, {})
+    assert writer.cards == [] and state.cards.pick() == card
+    state.record(enemy, {'status': False})
+    assert writer.cards[0][0] == card and writer.cards[0][6]
+    assert state.cards.cooling[0][0] - writer.cards[0][5] == 50
+
+
+def test_budget_starved_timeout_is_not_a_server_error():
+    policy = RetryPolicy(timeout=5.0)
+    assert engine.starved(ReadTimeout(), ReadTimeout, 0.4, policy)
+    assert not engine.starved(ReadTimeout(), ReadTimeout, 5.0, policy)
+    assert not engine.starved(ConnectionError(), ReadTimeout, 0.4, policy)
+
+
+def test_stop_ends_the_call_without_a_request(pacer):
+    reporter = Reporter(1)
+    reporter.stop_event.set()
+    session = FakeSession(FakeResponse())
+    assert engine.battle(session, '101', 'q', [1], reporter) == {}
+    assert session.requests == []
+
+
+def test_async_driver_runs_the_same_steps(pacer):
+    pacer.interval = 0.0
+    reporter = Reporter(1)
+    transport = FakeTransport(ConnectionError('reset'), FakeResponse())
+    steps = engine.battle_steps('101', 'q', [1], reporter)
+    assert asyncio.run(engine.run_steps_async(steps, transport, reporter))['data']['xp_added'] == 3
+    assert len(transport.requests) == 2
+
+
+def test_request_aborted_by_stop_is_not_a_server_error(pacer):
+    reporter = Reporter(1)
+
+    class AbortingSession(FakeSession):
+        def request(self, *args, **kwargs):
+            reporter.stop_event.set()
+            raise ConnectionError('aborted')
+
+    assert engine.battle(AbortingSession(), '101', 'q', [1], reporter) == {}
+    assert pacer.errors == 0
+
+
+def test_merge_enemies_prefers_fresh_rows():
+    stored = [Opponent('1', 10, 1, 3), Opponent('2', 20, 1, 3)]
+    fresh = [Opponent('2', 25, 2, 3)]
+    assert list(engine.merge_enemies(iter(stored), fresh)) == [Opponent('2', 25, 2, 3), Opponent('1', 10, 1, 3)]
@@ -0,0 +1,68 @@
+import os
+
+from journal import Journal, analyze, iter_events, journal_files
+
+
+def battle(ts, attacker, won=True, xp=5, power=100, account=1):
+    return {'ts': ts, 'event': 'battle', 'account': account, 'attacker': attacker,
+            'won': won, 'xp_added': xp if won else 0, 'power': power}
+
+
+def test_rotation_keeps_backups_under_max_bytes(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = Journal(path, max_bytes=300, backups=2, flush_interval=0.01)
+    for i in range(40):
+        journal.event('tick', n=i)
+    journal.close(5)
+    files = journal_files(path)
+    assert files == [f'{path}.2', f'{path}.1', path]
+    assert all(os.path.getsize(name) <= 300 for name in files)
+    numbers = [event['n'] for event in iter_events(path)]
+    # The oldest lines went with the backup that fell off the end.
+    assert numbers == list(range(numbers[0], 40)) and numbers[0] > 0
+
+
+def test_unwritable_path_drops_events_without_blocking_flush(tmp_path):
+    journal = Journal(str(tmp_path / 'missing' / 'journal.jsonl'), flush_interval=0.01)
+    journal.event('tick', n=1)
+    assert journal.flush(5)
+    assert journal.dropped == 1 and journal.errors == 1
+    assert isinstance(journal.last_error, FileNotFoundError)
+    journal.close(5)
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    path.write_text('{"ts": 1, "event": "a"}\n{"ts": 2, "ev', encoding='utf-8')
+    assert [event['event'] for event in iter_events(str(path))] == ['a']
+
+
+def test_analyze_groups_by_attacker_not_slot():
+    events = [battle(1000 + i * 10, '777') for i in range(10)]
+    events += [battle(1000 + i * 10, '888', won=False) for i in range(10)]
+    accounts = analyze(iter(events))['accounts']
+    assert set(accounts) == {'777', '888'}
+    assert accounts['777']['wins'] == 10 and accounts['888']['wins'] == 0
+
+
+def test_analyze_times_only_sessions():
+    events = []
+    for start in (0, 86400):
+        events += [battle(start + i * 10, '777') for i in range(360)]
+        events.append({'ts': start + 3600, 'event': 'session', 'account': 1, 'attacker': '777'})
+    totals = analyze(iter(events))['accounts']['777']
+    assert totals['sessions'] == 2
+    assert totals['seconds'] == 7200
+    assert totals['battles'] / (totals['seconds'] / 3600) == 360
+
+
+def test_analyze_splits_killed_runs_on_gaps():
+    events = [battle(i * 10, '777') for i in range(10)] + [battle(10000 + i * 10, '777') for i in range(10)]
+    totals = analyze(iter(events), gap=1800)['accounts']['777']
+    assert totals['sessions'] == 2
+    assert totals['seconds'] == 180
+
+
+def test_analyze_power_bands():
+    events = [battle(1, '7', power=150), battle(2, '7', won=False, power=1999), battle(3, '7', power=None)]
+    assert analyze(iter(events), band=1000)['bands'] == {0: [1, 1, 5], 1000: [1, 0, 0], None: [1, 1, 5]}
@@ -0,0 +1,66 @@
+import pytest
+
+from pacing import AdaptivePacer
+
+
+def pacer(clock, **kwargs):
+    return AdaptivePacer(**{'interval': 1.0, 'min_interval': 0.2, 'max_interval': 120.0, 'clock': clock, **kwargs})
+
+
+def test_reserve_spaces_requests(clock):
+    p = pacer(clock)
+    assert [p.reserve() for _ in range(3)] == [0, 1, 2]
+    clock.advance(10)
+    assert p.reserve() == 0
+
+
+def test_throttle_doubles_interval_and_holds_for_retry_after(clock):
+    p = pacer(clock)
+    p.observe(429, 0.1, retry_after=30)
+    assert p.interval == 2
+    assert p.throttled == 1
+    assert p.reserve() == 30
+
+
+def test_reserve_past_limit_claims_nothing(clock):
+    p = pacer(clock)
+    p.observe(429, 0.1, retry_after=30)
+    assert p.reserve(limit=10) is None
+    assert p.reserve(limit=10) is None
+    # Nothing was claimed, so the first slot after the hold is still free.
+    assert p.reserve(limit=30) == 30
+    assert p.reserve() == 32
+
+
+def test_errors_and_timeouts_grow_the_interval(clock):
+    p = pacer(clock)
+    p.observe(503, 0.1)
+    p.observe(None, 5.0)
+    assert p.interval == pytest.approx(2.25)
+    assert p.errors == 2
+
+
+def test_backoff_is_capped(clock):
+    p = pacer(clock, max_interval=10)
+    for _ in range(10):
+        p.observe(429, 0.1)
+    assert p.interval == 10
+
+
+def test_recovers_slowly_down_to_min_interval(clock):
+    p = pacer(clock, interval=4.0, recover=0.02)
+    p.observe(200, 0.1)
+    assert p.interval == pytest.approx(3.92)
+    for _ in range(1000):
+        p.observe(200, 0.1)
+    assert p.interval == 0.2
+
+
+def test_rising_latency_backs_off(clock):
+    p = pacer(clock)
+    for _ in range(5):
+        p.observe(200, 0.1)
+    healthy = p.interval
+    for _ in range(10):
+        p.observe(200, 2.0)
+    assert p.interval > healthy
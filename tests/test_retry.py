@@ -0,0 +1,86 @@
+from email.utils import formatdate
+from time import time
+
+from retry import RetryCall, RetryPolicy, retry_after
+
+
+class FakeResponse:
+    def __init__(self, retry_after=None):
+        self.headers = {'Retry-After': retry_after} if retry_after is not None else {}
+
+
+def policy(**kwargs):
+    return RetryPolicy(**{'attempts': 4, 'base_delay': 1.0, 'max_delay': 30.0, 'budget': 60.0,
+                          'timeout': 5.0, 'jitter': 0.0, **kwargs})
+
+
+def test_attempts_stop_at_policy_attempts(clock):
+    assert list(RetryCall(policy(attempts=3), clock)) == [1, 2, 3]
+
+
+def test_budget_ends_iteration(clock):
+    call = RetryCall(policy(budget=10), clock)
+    attempts = []
+    for attempt in call:
+        attempts.append(attempt)
+        clock.advance(6)
+    assert attempts == [1, 2]
+
+
+def test_backoff_doubles_up_to_max_delay(clock):
+    call = RetryCall(policy(attempts=10, base_delay=2, max_delay=5, budget=1000), clock)
+    delays = []
+    for _ in call:
+        delay = call.retry_delay()
+        if delay is None:
+            break
+        delays.append(delay)
+    assert delays[:4] == [2, 4, 5, 5]
+
+
+def test_no_retry_after_last_attempt(clock):
+    call = RetryCall(policy(attempts=2), clock)
+    for _ in call:
+        pass
+    assert call.retry_delay() is None
+
+
+def test_retry_delay_gives_up_past_budget(clock):
+    call = RetryCall(policy(base_delay=4, budget=10), clock)
+    next(iter(call))
+    assert call.retry_delay() == 4
+    clock.advance(7)
+    assert call.retry_delay() is None
+    assert call.retries == 1
+
+
+def test_retry_after_overrides_backoff_within_budget(clock):
+    call = RetryCall(policy(budget=20), clock)
+    next(iter(call))
+    assert call.retry_delay(FakeResponse('3')) == 3
+    assert call.retry_delay(FakeResponse('50')) is None
+
+
+def test_retry_after_parsing():
+    assert retry_after(FakeResponse('2.5')) == 2.5
+    assert retry_after(FakeResponse('-1')) == 0.0
+    assert 8 <= retry_after(FakeResponse(formatdate(time() + 10, usegmt=True))) <= 10
+    assert retry_after(FakeResponse('soon')) is None
+    assert retry_after(FakeResponse()) is None
+    assert retry_after(None) is None
+
+
+def test_timeout_is_capped_by_budget_with_a_floor(clock):
+    call = RetryCall(policy(budget=8, timeout=5), clock)
+    assert call.timeout() == 5
+    clock.advance(6)
+    assert call.timeout() == 2
+    clock.advance(5)
+    assert call.timeout() == 0.1
+
+
+def test_slot_limit_leaves_the_full_timeout(clock):
+    call = RetryCall(policy(budget=60, timeout=5), clock)
+    assert call.slot_limit() == 55
+    clock.advance(58)
+    assert call.slot_limit() == 0
@@ -0,0 +1,55 @@
+from decoding import project_players
+from storage import Opponent, enemies_from_players
+from selection import TargetSelector
+
+
+def decoded(*ids):
+    payload = {'data': {'players': [{'id': i, 'def_power': 500, 'level': 10, 'league_id': 3} for i in ids]}}
+    return enemies_from_players(project_players(payload), 0)
+
+
+def test_rank_prefers_weaker_enemies():
+    selector = TargetSelector(1000)
+    enemies = [Opponent('1', 1500, 10, 3), Opponent('2', 500, 10, 3), Opponent('3', 1000, 10, 3)]
+    assert [e.id for e in selector.rank(enemies)] == ['2', '3', '1']
+
+
+def test_rank_limit_keeps_the_same_head():
+    selector = TargetSelector(1000)
+    enemies = [Opponent(str(i), 100 * (i % 17), i % 5, 3) for i in range(200)]
+    assert selector.rank(iter(enemies), 20) == selector.rank(enemies)[:20]
+
+
+def test_history_moves_the_ranking():
+    selector = TargetSelector(1000)
+    selector.load([('1', 5, 0, 50, 900), ('2', 0, 0, 0, 900)])
+    assert [e.id for e in selector.rank([Opponent('2', 900, 1, 3), Opponent('1', 900, 1, 3)])] == ['1', '2']
+
+
+def test_repeated_losses_mark_an_enemy_strong():
+    selector = TargetSelector(1000)
+    for _ in range(3):
+        selector.record('7', 1200, False)
+    assert selector.is_strong('7')
+    for _ in range(6):
+        selector.record('7', 1200, True, 10)
+    assert not selector.is_strong('7')
+
+
+def test_strong_history_from_the_db_matches_server_ids():
+    # Outcomes rows carry text ids; getopponents sends numbers.
+    selector = TargetSelector(1000)
+    selector.load([('101', 0, 4, 0, 500)])
+    enemies = decoded(101, 102)
+    assert [e.id for e in enemies] == ['101', '102']
+    assert selector.is_strong(enemies[0].id)
+    assert [e.id for e in selector.rank(enemies)] == ['102']
+
+
+def test_session_stats_share_one_key():
+    selector = TargetSelector(1000)
+    selector.load([('101', 1, 0, 10, 500)])
+    enemy = decoded(101)[0]
+    selector.record(enemy.id, enemy.power, True, 10)
+    assert list(selector.stats) == ['101']
+    assert selector.stats['101'][0] == 2
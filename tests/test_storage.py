@@ -0,0 +1,145 @@
+import sqlite3
+
+import pytest
+
+from storage import (DBWriter, EnemyReader, Opponent, OpponentCache, acquire_writer, create_or_open_db, evict_stale,
+                     migrate_checkpoint_cards, migrations, release_writer)
+
+
+def columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def baseline_db(path):
+    # The schema main.py created before storage.py existed.
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE Accounts (id TEXT UNIQUE, power NUMERIC, level NUMERIC, league NUMERIC, PRIMARY KEY(id))')
+    conn.execute('CREATE TABLE StrongPlayers (id TEXT UNIQUE, PRIMARY KEY(id))')
+    conn.execute('CREATE TABLE WeakPlayers (id TEXT UNIQUE, PRIMARY KEY(id))')
+    conn.execute("INSERT INTO Accounts VALUES ('101', 500, 10, 3)")
+    conn.execute("INSERT INTO StrongPlayers VALUES ('102')")
+    conn.commit()
+    conn.close()
+
+
+def test_migrates_the_baseline_schema(tmp_path):
+    path = str(tmp_path / 'league.db')
+    baseline_db(path)
+    conn, cursor = create_or_open_db(path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == len(migrations)
+    assert {'first_seen', 'last_seen', 'last_attacked'} <= set(columns(conn, 'Accounts'))
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        assert 'cards' not in columns(conn, 'Checkpoints')
+    # Old rows survive and count as seen now.
+    row = conn.execute("SELECT power, level, last_seen FROM Accounts WHERE id = '101'").fetchone()
+    assert row[:2] == (500, 10) and row[2] is not None
+    assert conn.execute('SELECT id FROM StrongPlayers WHERE updated_at IS NOT NULL').fetchall() == [('102',)]
+    conn.close()
+
+
+def test_verdicts_are_evicted_by_their_own_age(tmp_path):
+    # Neither opponent is in Accounts, as with save_to_db off.
+    conn, cursor = create_or_open_db(str(tmp_path / 'league.db'))
+    conn.execute("INSERT INTO StrongPlayers VALUES ('1', 100)")
+    conn.execute("INSERT INTO WeakPlayers VALUES ('2', 1000)")
+    assert evict_stale(conn, ttl=500, now=1200) == 1
+    assert conn.execute('SELECT id FROM WeakPlayers').fetchall() == [('2',)]
+    assert conn.execute('SELECT id FROM StrongPlayers').fetchall() == []
+    conn.close()
+
+
+def test_migrations_run_once(tmp_path):
+    path = str(tmp_path / 'league.db')
+    conn, cursor = create_or_open_db(path)
+    conn.close()
+    conn, cursor = create_or_open_db(path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == len(migrations)
+    conn.close()
+
+
+def test_checkpoint_column_dropped_from_older_db(tmp_path):
+    path = str(tmp_path / 'league.db')
+    conn, cursor = create_or_open_db(path)
+    conn.execute('ALTER TABLE Checkpoints ADD COLUMN cards TEXT')
+    conn.execute(f'PRAGMA user_version={migrations.index(migrate_checkpoint_cards)}')
+    conn.commit()
+    conn.close()
+    conn, cursor = create_or_open_db(path)
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        assert 'cards' not in columns(conn, 'Checkpoints')
+    conn.close()
+
+
+def test_reader_pages_through_every_enemy_in_order(tmp_path):
+    path = str(tmp_path / 'league.db')
+    conn, cursor = create_or_open_db(path)
+    rows = [(str(i), 100 * (i % 3), i % 4, 3, 0.0, 0.0) for i in range(10)]
+    conn.executemany('INSERT INTO Accounts (id, power, level, league, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+    reader = EnemyReader(path)
+    enemies = list(reader.iter_enemies(0, page_size=3))
+    reader.close()
+    assert len(enemies) == 10 and all(isinstance(e, Opponent) for e in enemies)
+    assert enemies == sorted(enemies, key=lambda e: (e.power, -e.level, e.id))
+
+
+def test_writer_round_trips_outcomes_and_card_usage(tmp_path):
+    path = str(tmp_path / 'league.db')
+    writer = DBWriter(path).start()
+    writer.record_outcome('9', '101', 500, True, 12)
+    writer.record_outcome('9', '101', 500, False)
+    writer.record_card('9', (4, 2, 1, 1, 0, 1000.0, False))
+    writer.close(5)
+    reader = EnemyReader(path)
+    assert reader.outcomes('9') == [('101', 1, 1, 12, 500)]
+    assert reader.card_usage('9') == [(4, 2, 1, 1, 0, 1000.0, 0)]
+    reader.close()
+
+
+def test_failing_statement_does_not_swallow_close(tmp_path):
+    writer = DBWriter(str(tmp_path / 'league.db'))
+    # Queued before the thread starts, so both land in one group.
+    writer.queue.put(('INSERT INTO Missing VALUES (?)', [(1,)]))
+    writer.queue.put(None)
+    writer.start()
+    writer.join(5)
+    assert not writer.is_alive()
+    assert writer.errors == 1
+
+
+def test_failing_batch_only_drops_itself(tmp_path):
+    path = str(tmp_path / 'league.db')
+    writer = DBWriter(path)
+    writer.record_card('9', (4, 2, 1, 1, 0, 1000.0, False))
+    writer.queue.put(('INSERT INTO Missing VALUES (?)', [(1,)]))
+    writer.record_card('9', (5, 1, 1, 0, 0, 1000.0, False))
+    writer.start()
+    writer.close(5)
+    assert writer.errors == 1 and writer.rows_written == 2
+    reader = EnemyReader(path)
+    assert sorted(row[0] for row in reader.card_usage('9')) == [4, 5]
+    reader.close()
+
+
+def test_open_error_reaches_every_user_of_the_writer(tmp_path):
+    path = str(tmp_path / 'missing' / 'league.db')
+    for _ in range(2):
+        with pytest.raises(sqlite3.OperationalError):
+            acquire_writer(path)
+    # The failed writer is not handed out again.
+    (tmp_path / 'missing').mkdir()
+    writer = acquire_writer(path)
+    assert writer.is_alive()
+    release_writer(writer)
+    assert not writer.is_alive()
+
+
+def test_one_account_fetches_a_league_for_everyone():
+    cache = OpponentCache()
+    assert cache.claim(3) is None
+    pending = cache.claim(3)
+    assert not pending.is_set()
+    cache.release(3, ['p'])
+    assert pending.is_set() and cache.get(3) == ['p']